@@ -8,12 +8,75 @@ RAG implementation removed after this benchmark proved simple > complex.
 See RAG_LEARNINGS.md for full analysis.
 """
 
+import heapq
+import os
 import time
 import glob
 import re
 from pathlib import Path
-from typing import List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
 from dataclasses import dataclass
+from functools import lru_cache
+
+# Lowercase word tokens used for both indexing and queries
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+@lru_cache(maxsize=4096)
+def _terms_pattern(terms: Tuple[str, ...]) -> re.Pattern:
+    """Compiled case-insensitive alternation matching any of the query terms"""
+    alternatives = sorted(terms, key=len, reverse=True)  # longest wins at a position
+    return re.compile("|".join(map(re.escape, alternatives)), re.IGNORECASE)
+
+def _read_workers() -> int:
+    """Reader threads for index builds, bounded by the CPUs we may run on"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # not available on macOS/Windows
+        cpus = os.cpu_count() or 1
+    return min(32, cpus + 4)
+
+def _read_doc(file_path: Path) -> Optional[str]:
+    try:
+        return file_path.read_text(encoding='utf-8', errors='ignore')
+    except Exception:
+        return None
+
+def _varbyte_encode(values: Iterable[int]) -> bytes:
+    """7 bits per byte, high bit set on every byte except a value's last"""
+    out = bytearray()
+    for value in values:
+        while value >= 0x80:
+            out.append((value & 0x7F) | 0x80)
+            value >>= 7
+        out.append(value)
+    return bytes(out)
+
+def _varbyte_decode(data: bytes) -> Iterator[int]:
+    value = shift = 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            yield value
+            value = shift = 0
+
+def _encode_postings(plist: List[Tuple[int, int, int]]) -> bytes:
+    """Pack doc_id-sorted postings as (doc_gap, tf, first_offset + 1) varbytes"""
+    flat = []
+    prev = 0
+    for doc_id, tf, offset in plist:
+        flat.extend((doc_id - prev, tf, offset + 1))
+        prev = doc_id
+    return _varbyte_encode(flat)
+
+def _decode_postings(data: bytes) -> Iterator[Tuple[int, int, int]]:
+    values = _varbyte_decode(data)
+    doc_id = 0
+    for gap, tf, offset in zip(values, values, values):
+        doc_id += gap
+        yield doc_id, tf, offset - 1
 
 @dataclass
 class SearchResult:
@@ -24,63 +87,151 @@ class SearchResult:
     result_count: int
 
 class NaiveSearcher:
-    """Dead simple text search - the baseline"""
+    """Dead simple text search - the baseline
+
+    The corpus is tokenized once into an inverted index (term -> postings of
+    (doc_id, term_freq, first_offset)); queries intersect postings instead of
+    rescanning every file, and snippets are cut at the recorded offset.
+    Postings are stored gap-encoded and varbyte-compressed, with document
+    frequencies kept alongside so lists can be ordered without decoding.
+    """
     
     def __init__(self, docs_dir: str = "docs"):
         self.docs_dir = Path(docs_dir)
-        print(f"📁 Naive searcher initialized for {docs_dir}")
+        self.docs: List[Path] = []
+        self.postings: Dict[str, bytes] = {}
+        self.df: Dict[str, int] = {}
+        self._snapshot: Dict[Path, int] = {}
+        self._build_index(self._tree_snapshot())
+        print(f"📁 Naive searcher initialized for {docs_dir} "
+              f"({len(self.docs)} docs, {len(self.postings)} terms)")
     
-    def search(self, query: str, top_k: int = 5) -> List[str]:
-        """Simple case-insensitive text search"""
-        start_time = time.time()
-        results = []
-        
-        # Find all markdown files
+    def _tree_snapshot(self) -> Dict[Path, int]:
+        """mtime_ns of every markdown file under docs_dir"""
+        snapshot = {}
         for file_path in self.docs_dir.rglob("*.md"):
             try:
-                content = file_path.read_text(encoding='utf-8', errors='ignore')
-                
-                # Check if query terms are in the content
-                if self._matches_query(query.lower(), content.lower()):
-                    # Extract relevant snippet
-                    snippet = self._extract_snippet(query.lower(), content)
-                    results.append({
-                        'file': str(file_path.relative_to(self.docs_dir)),
-                        'snippet': snippet,
-                        'score': self._calculate_score(query.lower(), content.lower())
-                    })
-            except Exception as e:
+                snapshot[file_path] = file_path.stat().st_mtime_ns
+            except OSError:
                 continue
+        return snapshot
+    
+    def refresh(self) -> bool:
+        """Rebuild the index if markdown files were added, removed or modified
+
+        Queries never walk the tree; long-lived callers invoke this when they
+        want to pick up edits. Returns True if the index was rebuilt.
+        """
+        snapshot = self._tree_snapshot()
+        if snapshot == self._snapshot:
+            return False
+        self._build_index(snapshot)
+        return True
+    
+    def _build_index(self, snapshot: Dict[Path, int]):
+        """Tokenize every markdown file once and record per-term postings"""
+        self._snapshot = snapshot
+        self.docs = []
+        self.postings = {}
+        self.df = {}
+        paths = list(snapshot)
+        # Reads are I/O-bound and fan out across threads; tokenizing stays
+        # on this thread so the regex work doesn't fight over the GIL
+        with ThreadPoolExecutor(max_workers=_read_workers()) as pool:
+            contents = list(pool.map(_read_doc, paths))
+        postings: Dict[str, List[Tuple[int, int, int]]] = {}
+        for file_path, content in zip(paths, contents):
+            if content is None:
+                continue
+            doc_id = len(self.docs)
+            self.docs.append(file_path)
+            lowered = content.lower()
+            # Offsets only map back onto the original text if lower() kept its length
+            aligned = len(lowered) == len(content)
+            counts: Dict[str, int] = {}
+            first: Dict[str, int] = {}
+            for match in TOKEN_RE.finditer(lowered):
+                term = match.group()
+                if term in counts:
+                    counts[term] += 1
+                else:
+                    counts[term] = 1
+                    first[term] = match.start() if aligned else -1
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((doc_id, tf, first[term]))
+        for term, plist in postings.items():
+            self.postings[term] = _encode_postings(plist)
+            self.df[term] = len(plist)
+    
+    def search(self, query: str, top_k: int = 5) -> List[str]:
+        """Simple case-insensitive term search (all terms must be present)"""
+        query_terms = list(dict.fromkeys(TOKEN_RE.findall(query.lower())))
+        if not query_terms:
+            return []
         
-        # Sort by score and return top results
-        results.sort(key=lambda x: x['score'], reverse=True)
+        # Intersect and score in one pass per postings list, smallest first.
+        # Each hit is [summed tf, earliest offset, matched term length], so the
+        # same pass that scores a document also locates its snippet.
+        ordered = sorted(query_terms, key=lambda t: self.df.get(t, 0))
+        lead = ordered[0]
+        if lead not in self.df:
+            return []  # a term no document contains can never intersect
+        hits: Dict[int, List[int]] = {doc_id: [tf, off, len(lead)]
+                                      for doc_id, tf, off in self._postings(lead)}
+        for term in ordered[1:]:
+            if not hits:
+                break
+            survivors: Dict[int, List[int]] = {}
+            for doc_id, tf, off in self._postings(term):
+                hit = hits.get(doc_id)
+                if hit is not None:
+                    hit[0] += tf
+                    if off < hit[1]:
+                        hit[1], hit[2] = off, len(term)
+                    survivors[doc_id] = hit
+            hits = survivors
         
-        return [f"{r['file']}: {r['snippet']}" for r in results[:top_k]]
-    
-    def _matches_query(self, query: str, content: str) -> bool:
-        """Check if content matches query (all terms must be present)"""
-        query_terms = query.split()
-        return all(term in content for term in query_terms)
-    
-    def _extract_snippet(self, query: str, content: str, snippet_length: int = 100) -> str:
-        """Extract a snippet around the first match"""
-        query_terms = query.split()
-        for term in query_terms:
-            match = re.search(re.escape(term), content, re.IGNORECASE)
+        # Partial top-k selection; ties keep corpus order
+        top = heapq.nlargest(top_k, hits, key=lambda doc_id: (hits[doc_id][0], -doc_id))
+        
+        # Only the winning files are opened to build snippets
+        pattern = _terms_pattern(tuple(query_terms))
+        results = []
+        for doc_id in top:
+            file_path = self.docs[doc_id]
+            content = _read_doc(file_path)
+            if content is None:
+                continue
+            _, offset, length = hits[doc_id]
+            snippet = self._extract_snippet(pattern, content, offset, length)
+            results.append(f"{file_path.relative_to(self.docs_dir)}: {snippet}")
+        return results
+    
+    def _postings(self, term: str) -> Iterator[Tuple[int, int, int]]:
+        """Lazily decode a term's postings; unknown terms yield nothing"""
+        return _decode_postings(self.postings.get(term, b""))
+    
+    def _extract_snippet(self, pattern: re.Pattern, content: str, offset: int = -1,
+                         length: int = 0, snippet_length: int = 100) -> str:
+        """Extract a snippet around the first match
+
+        `offset` is the indexed position of the earliest query term (`length`
+        chars long); a single scan with the all-terms `pattern` is only a
+        fallback for documents whose offsets are unaligned.
+        """
+        span = None
+        if offset >= 0:
+            span = (offset, offset + length)
+        else:
+            match = pattern.search(content)
             if match:
-                start = max(0, match.start() - snippet_length // 2)
-                end = min(len(content), match.end() + snippet_length // 2)
-                snippet = content[start:end].strip()
-                return f"...{snippet}..." if start > 0 or end < len(content) else snippet
-        return content[:snippet_length] + "..."
-    
-    def _calculate_score(self, query: str, content: str) -> float:
-        """Simple scoring based on term frequency"""
-        query_terms = query.split()
-        score = 0
-        for term in query_terms:
-            score += content.count(term)
-        return score
+                span = match.span()
+        if span is None:
+            return content[:snippet_length] + "..."
+        start = max(0, span[0] - snippet_length // 2)
+        end = min(len(content), span[1] + snippet_length // 2)
+        snippet = content[start:end].strip()
+        return f"...{snippet}..." if start > 0 or end < len(content) else snippet
 
 class RAGSearcher:
     """Our fancy RAG system (REMOVED - naive search won the benchmark)"""
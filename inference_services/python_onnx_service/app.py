@@ -5,9 +5,14 @@ load_dotenv()
 import time
 import numpy as np
 import onnxruntime as ort
-from fastapi import FastAPI
+import orjson
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
 import asyncio
+import threading
+from collections import OrderedDict
+from functools import lru_cache
 from typing import List, Tuple
 
 # Request/Response schemas
@@ -18,8 +23,30 @@ class InferenceResponse(BaseModel):
     outputs: List[List[float]]
     duration_ms: float  # Inference time in milliseconds
 
+class NumpyORJSONResponse(ORJSONResponse):
+    # orjson with ndarray passthrough, so handlers can skip tolist()
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
+
 # FastAPI app
-app = FastAPI()
+app = FastAPI(default_response_class=NumpyORJSONResponse)
+
+INTRA_OP_THREADS = int(os.getenv("INTRA_OP_THREADS", "0"))
+# Serve the int8 model from scripts/quantize_model.py when it exists;
+# MODEL_QUANT=0 forces the fp32 model
+MODEL_QUANT = os.getenv("MODEL_QUANT", "1") == "1"
+
+_cpu_arena_registered = False
+
+def register_cpu_arena():
+    global _cpu_arena_registered
+    if _cpu_arena_registered:
+        return
+    mem_info = ort.OrtMemoryInfo("Cpu", ort.OrtAllocatorType.ORT_ARENA_ALLOCATOR, 0, ort.OrtMemType.DEFAULT)
+    # max_mem=0 (no limit), arena_extend_strategy=1 (kSameAsRequested), defaults otherwise
+    arena_cfg = ort.OrtArenaCfg(0, 1, -1, -1)
+    ort.create_and_register_allocator(mem_info, arena_cfg)
+    _cpu_arena_registered = True
 
 # Load ONNX model on startup
 def get_session():
@@ -32,74 +59,289 @@ def get_session():
         )
     else:
         model_path = os.path.join(os.path.dirname(__file__), "model.onnx")
+    # Prefer the int8 model from scripts/quantize_model.py unless MODEL_QUANT=0
+    if MODEL_QUANT:
+        root, ext = os.path.splitext(model_path)
+        quant_path = f"{root}_int8{ext}"
+        if os.path.exists(quant_path):
+            model_path = quant_path
+        else:
+            print(f"No quantized model at {quant_path}; using {model_path}")
+    # Explicit threading: intra-op parallelism for the matmuls, no inter-op
+    # pool to oversubscribe FastAPI's executor threads
+    so = ort.SessionOptions()
+    so.intra_op_num_threads = INTRA_OP_THREADS  # 0 = one per physical core
+    so.inter_op_num_threads = 1
+    so.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    so.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    # Fixed input shapes let ORT plan memory once and reuse its arena
+    so.enable_mem_pattern = True
+    so.enable_cpu_mem_arena = True
+    so.enable_profiling = False
+    # Share one process-wide CPU arena that grows by exactly what is requested
+    # (kSameAsRequested) instead of doubling; it only takes effect because
+    # the session opts into env allocators
+    register_cpu_arena()
+    so.add_session_config_entry("session.use_env_allocators", "1")
     # Try GPU/backends on Apple M1: CoreML and MPS
     providers = []
     for p in ort.get_available_providers():
-        if p in ("CoreMLExecutionProvider", "MPSExecutionProvider"):
+        if p == "CoreMLExecutionProvider":
+            providers.append((p, {"MLComputeUnits": "CPUAndNeuralEngine"}))
+        elif p == "MPSExecutionProvider":
             providers.append(p)
     # Always add CPU as fallback
     providers.append("CPUExecutionProvider")
-    session = ort.InferenceSession(model_path, providers=providers)
-    print(f"ONNXRuntime providers: {session.get_providers()}")
+    session = ort.InferenceSession(model_path, sess_options=so, providers=providers)
+    print(f"ONNXRuntime model: {os.path.basename(model_path)}, providers: {session.get_providers()}")
     return session
 
-session = get_session()
+# Created on first use (warm_up at startup), so importing this module stays
+# cheap for tools that never serve
+@lru_cache(maxsize=1)
+def _session() -> ort.InferenceSession:
+    return get_session()
+
+@lru_cache(maxsize=1)
+def model_io() -> Tuple[int, str, int]:
+    # (input width, output name, output width)
+    session = _session()
+    output = session.get_outputs()[0]
+    return session.get_inputs()[0].shape[-1], output.name, output.shape[-1]
 
 batch_queue: asyncio.Queue = asyncio.Queue()
 BATCH_SIZE = int(os.getenv("BATCH_SIZE", "16"))
 FLUSH_MS = float(os.getenv("FLUSH_MS", "5"))
+MIN_BATCH = int(os.getenv("MIN_BATCH", "1"))
+
+# batch_worker's IOBinding and host buffers, specialized to the model's input
+# width and reused across batches; allocated on the first batch and only
+# regrown when a batch has more rows than BATCH_SIZE
+io_binding = None
+_in_buf = None
+_out_buf = None
+
+def run_bound(chunks: List, n: int) -> np.ndarray:
+    # Each chunk is one request's rows (nested lists or a float32 ndarray),
+    # copied straight into its slice of the input buffer. Returns a view into
+    # the shared output buffer, valid until the next call.
+    global io_binding, _in_buf, _out_buf
+    session = _session()
+    input_dim, output_name, output_dim = model_io()
+    if io_binding is None:
+        io_binding = session.io_binding()
+    if _in_buf is None or n > _in_buf.shape[0]:
+        rows = max(n, BATCH_SIZE)
+        _in_buf = np.empty((rows, input_dim), dtype=np.float32)
+        _out_buf = np.empty((rows, output_dim), dtype=np.float32)
+    idx = 0
+    for rows in chunks:
+        _in_buf[idx:idx+len(rows)] = rows
+        idx += len(rows)
+    inp = _in_buf[:n]
+    out = _out_buf[:n]
+    io_binding.bind_cpu_input("X", inp)
+    io_binding.bind_output(output_name, "cpu", 0, np.float32, list(out.shape), out.ctypes.data)
+    session.run_with_iobinding(io_binding)
+    return out
+
+def warm_up():
+    # The first runs allocate kernels and arena blocks; pay for that before
+    # serving traffic rather than on the first requests
+    input_dim, _, _ = model_io()
+    zeros = np.zeros((BATCH_SIZE, input_dim), dtype=np.float32)
+    run_bound([zeros], BATCH_SIZE)
+    for rows in sorted({1, MIN_BATCH, BATCH_SIZE}):
+        _session().run(None, {"X": zeros[:rows]})
 
 @app.on_event("startup")
 async def start_batcher():
+    await asyncio.get_running_loop().run_in_executor(None, warm_up)
     asyncio.create_task(batch_worker())
 
 async def batch_worker():
     while True:
-        batch_inputs = []
+        chunks = []
+        batch_rows = 0
         request_futures: List[Tuple[asyncio.Future, int]] = []
         start = time.time()
-        while len(batch_inputs) < BATCH_SIZE:
+        # Block for the first request, then drain whatever is already queued;
+        # FLUSH_MS is only spent waiting while the batch is below MIN_BATCH,
+        # and it bounds the whole batch rather than each awaited item
+        inps, fut = await batch_queue.get()
+        chunks.append(inps)
+        batch_rows += len(inps)
+        request_futures.append((fut, len(inps)))
+        loop = asyncio.get_running_loop()
+        deadline = None
+        while batch_rows < BATCH_SIZE:
             try:
-                inps, fut = await asyncio.wait_for(batch_queue.get(), FLUSH_MS / 1000)
-            except asyncio.TimeoutError:
-                break
-            batch_inputs.extend(inps)
+                inps, fut = batch_queue.get_nowait()
+            except asyncio.QueueEmpty:
+                if batch_rows >= MIN_BATCH:
+                    break
+                if deadline is None:
+                    deadline = loop.time() + FLUSH_MS / 1000
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    inps, fut = await asyncio.wait_for(batch_queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+            chunks.append(inps)
+            batch_rows += len(inps)
             request_futures.append((fut, len(inps)))
-        if not batch_inputs:
+        if not batch_rows:
+            for fut, _ in request_futures:
+                fut.set_result((np.empty((0, model_io()[2]), dtype=np.float32), 0.0))
             continue
         start_run = time.time()
-        arr = np.array(batch_inputs, dtype=np.float32)
-        raw_outputs = await asyncio.get_event_loop().run_in_executor(
-            None,
-            session.run,
+        out = await asyncio.get_event_loop().run_in_executor(
             None,
-            {"X": arr}
+            run_bound,
+            chunks,
+            batch_rows
         )
-        raw = raw_outputs[0].tolist()
+        raw = out.copy()  # out is a view into the reused output buffer
         duration = (time.time() - start_run) * 1000.0
         idx = 0
         for fut, cnt in request_futures:
             fut.set_result((raw[idx:idx+cnt], duration))
             idx += cnt
 
+def numpy_json_response(outputs: np.ndarray, duration: float) -> Response:
+    # InferenceResponse-shaped JSON straight from the array, no tolist()/Pydantic pass.
+    # FastAPI returns Response objects as-is, so the routes' response_model only
+    # documents this schema in OpenAPI and is never validated against.
+    return NumpyORJSONResponse({"outputs": outputs, "duration_ms": duration})
+
+def decode_rows(body: bytes) -> np.ndarray:
+    # Binary contract: row-major float32 rows of the model's input width, no copy
+    input_dim, _, _ = model_io()
+    if not body or len(body) % (4 * input_dim):
+        raise HTTPException(status_code=400, detail=f"body must be float32 rows of {input_dim} features")
+    return np.frombuffer(body, dtype=np.float32).reshape(-1, input_dim)
+
+# /infer runs on FastAPI's threadpool, so its IOBinding and host buffers are
+# per thread. Capacities are rounded up to a power of two to keep the set of
+# shapes small.
+_infer_local = threading.local()
+
+def pooled_buffers(rows: int) -> Tuple[np.ndarray, np.ndarray]:
+    buffers = getattr(_infer_local, "buffers", None)
+    if buffers is None:
+        buffers = _infer_local.buffers = {}
+        _infer_local.binding = _session().io_binding()
+    capacity = 1 << max(rows - 1, 0).bit_length()
+    bufs = buffers.get(capacity)
+    if bufs is None:
+        input_dim, _, output_dim = model_io()
+        bufs = buffers[capacity] = (
+            np.empty((capacity, input_dim), dtype=np.float32),
+            np.empty((capacity, output_dim), dtype=np.float32),
+        )
+    return bufs[0][:rows], bufs[1][:rows]
+
+# Opt-in cache of /infer outputs for recently seen input rows, keyed by the
+# row's float32 bytes; agents revisit identical observations often enough that
+# hits skip ORT entirely. ROW_CACHE_SIZE sets how many rows it keeps (memory
+# grows with it, about one output row each); the default 0 disables it.
+ROW_CACHE_SIZE = int(os.getenv("ROW_CACHE_SIZE", "0"))
+_row_cache: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+_row_cache_lock = threading.Lock()
+
+def row_cache_get(keys: List[bytes]) -> List:
+    with _row_cache_lock:
+        hits = []
+        for key in keys:
+            row = _row_cache.get(key)
+            if row is not None:
+                _row_cache.move_to_end(key)
+            hits.append(row)
+        return hits
+
+def row_cache_put(keys: List[bytes], rows: np.ndarray):
+    with _row_cache_lock:
+        for key, row in zip(keys, rows):
+            _row_cache[key] = row.copy()
+        while len(_row_cache) > ROW_CACHE_SIZE:
+            _row_cache.popitem(last=False)
+
 @app.post("/infer", response_model=InferenceResponse)
 def infer(request: InferenceRequest):
-    batch = np.array(request.inputs, dtype=np.float32)
+    batch, out = pooled_buffers(len(request.inputs))
+    batch[:] = request.inputs
+    binding = _infer_local.binding
+    start_time = time.time()
+    rows = batch.shape[0]
+    if ROW_CACHE_SIZE:
+        keys = [row.tobytes() for row in batch]
+        hits = row_cache_get(keys)
+        misses = [i for i, row in enumerate(hits) if row is None]
+    else:
+        misses = range(rows)
+    n = len(misses)
+    _, output_name, output_dim = model_io()
+    if n:
+        if n < rows:
+            # Compact the missed rows to the front of the input buffer
+            batch[:n] = batch[misses]
+        binding.bind_cpu_input("X", batch[:n])
+        binding.bind_output(output_name, "cpu", 0, np.float32, [n, output_dim], out.ctypes.data)
+        _session().run_with_iobinding(binding)
+        if ROW_CACHE_SIZE:
+            row_cache_put([keys[i] for i in misses], out[:n])
+    outputs = out
+    if n < rows:
+        outputs = np.empty((rows, output_dim), dtype=np.float32)
+        for i, row in enumerate(hits):
+            if row is not None:
+                outputs[i] = row
+        if n:
+            outputs[misses] = out[:n]
+    duration = (time.time() - start_time) * 1000.0
+    print(f"Inference: batch_size={rows}, cached={rows - n}, time={duration:.2f} ms")
+    # Serialized here, before this thread can reuse the output buffer
+    return numpy_json_response(outputs, duration)
+
+@app.post("/infer_bin")
+async def infer_bin(request: Request):
+    # float32 rows in, float32 outputs out
+    batch = decode_rows(await request.body())
     start_time = time.time()
-    result = session.run(None, {"X": batch})
+    # Off the event loop, so batch_worker and other requests keep running
+    result = await asyncio.get_running_loop().run_in_executor(
+        None, _session().run, None, {"X": batch}
+    )
     duration = (time.time() - start_time) * 1000.0
-    outputs = result[0].tolist()
-    print(f"Inference: batch_size={batch.shape[0]}, time={duration:.2f} ms")
-    return InferenceResponse(outputs=outputs, duration_ms=duration)
+    return Response(
+        content=result[0].tobytes(),
+        media_type="application/octet-stream",
+        headers={"X-Duration-Ms": f"{duration:.3f}"},
+    )
 
 @app.post("/infer_batch", response_model=InferenceResponse)
 async def infer_batch(request: InferenceRequest):
     fut = asyncio.get_event_loop().create_future()
     await batch_queue.put((request.inputs, fut))
     outputs, duration = await fut
-    return InferenceResponse(outputs=outputs, duration_ms=duration)
+    return numpy_json_response(outputs, duration)
+
+@app.post("/infer_batch_bin")
+async def infer_batch_bin(request: Request):
+    # Binary variant of /infer_batch: rows are memcpy'd into the batch buffer
+    batch = decode_rows(await request.body())
+    fut = asyncio.get_event_loop().create_future()
+    await batch_queue.put((batch, fut))
+    outputs, duration = await fut
+    return Response(
+        content=outputs.tobytes(),
+        media_type="application/octet-stream",
+        headers={"X-Duration-Ms": f"{duration:.3f}"},
+    )
 
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port, log_level="info")
+    uvicorn.run(app, host="0.0.0.0", port=port, log_level="info", loop="uvloop")
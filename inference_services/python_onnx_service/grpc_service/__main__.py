@@ -11,8 +11,10 @@ def main():
                         default=os.getenv("MODEL_PATH", "model.onnx"), help="Path to the ONNX model file")
     parser.add_argument("--workers", dest="workers", type=int,
                         default=int(os.getenv("WORKERS", multiprocessing.cpu_count())), help="Number of gRPC threads")
+    parser.add_argument("--precision", choices=("fp32", "int8"), default=os.getenv("PRECISION", "int8"),
+                        help="int8 serves <model>_int8.onnx when it exists, fp32 always serves the model as given")
     args = parser.parse_args()
-    serve(args.port, args.model_path, args.workers)
+    serve(args.port, args.model_path, args.workers, args.precision)
 
 if __name__ == "__main__":
     main()
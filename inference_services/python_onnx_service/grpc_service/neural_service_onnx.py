@@ -4,9 +4,12 @@ import sys
 import time
 import logging
 import platform
+import threading
+import asyncio
 import numpy as np
 import onnxruntime as ort
 import grpc
+import grpc.aio
 from concurrent import futures
 
 # Import generated proto modules via package-relative imports
@@ -20,10 +23,140 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+def resolve_model_path(model_path, precision="int8"):
+    """Prefer the <name>_int8 model from scripts/quantize_model.py unless precision is fp32"""
+    if precision != "int8":
+        return model_path
+    root, ext = os.path.splitext(model_path)
+    quant_path = f"{root}_int8{ext}"
+    if os.path.exists(quant_path):
+        return quant_path
+    logger.info(f"No quantized model at {quant_path}; using {model_path}")
+    return model_path
+
+def optimized_model_path(model_path):
+    """Path the fully optimized graph is serialized to, e.g. model.opt.onnx"""
+    root, ext = os.path.splitext(model_path)
+    return f"{root}.opt{ext}"
+
+def session_options(model_path, max_workers=1):
+    """Return (path_to_load, SessionOptions) for `model_path`
+    
+    Up to `max_workers` gRPC threads run the session concurrently, so the cores
+    are split between them and idle ORT threads sleep instead of spinning.
+    
+    The first start optimizes the graph at ORT_ENABLE_ALL (constant folding,
+    MatMul+Add+activation fusion) and saves the result next to the model; later
+    starts load that file with optimizations off so they are not redone.
+    """
+    so = ort.SessionOptions()
+    so.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    so.intra_op_num_threads = max(1, (os.cpu_count() or 1) // max(1, max_workers))
+    so.inter_op_num_threads = 1
+    so.add_session_config_entry("session.intra_op.allow_spinning", "0")
+    so.enable_cpu_mem_arena = True
+    so.enable_mem_pattern = True
+    opt_path = optimized_model_path(model_path)
+    if os.path.exists(opt_path) and os.path.getmtime(opt_path) >= os.path.getmtime(model_path):
+        so.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+        return opt_path, so
+    so.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if os.access(os.path.dirname(os.path.abspath(opt_path)), os.W_OK):
+        so.optimized_model_filepath = opt_path
+    return model_path, so
+
+def copy_features(row, features):
+    """Copy a protobuf repeated float field into the float32 array `row`"""
+    # Repeated fields expose neither the buffer protocol nor __array__, so plain
+    # assignment makes numpy walk them twice (dtype discovery, then the copy);
+    # fromiter converts each float once
+    row[:] = np.fromiter(features, dtype=np.float32, count=len(row))
+
+# Predict micro-batching: concurrent single-row calls are coalesced into one
+# session run of up to MB_MAX_BATCH rows, waiting at most MB_MAX_WAIT_US for
+# the batch to fill. MB_MAX_BATCH=1 runs every Predict on its own.
+MB_MAX_BATCH = int(os.getenv("MB_MAX_BATCH", "64"))
+MB_MAX_WAIT_US = int(os.getenv("MB_MAX_WAIT_US", "2000"))
+
+# Inference time is measured on one request in every STATS_SAMPLE_MASK + 1,
+# keeping the clock reads off most requests' hot path
+STATS_SAMPLE_MASK = 0x3F
+
+class MicroBatcher:
+    """Coalesces concurrent Predict rows into session runs
+    
+    Up to `max_in_flight` batches run at once, one per ORT pool thread; while
+    they are all busy, queued rows wait and go into the next, larger batch.
+    """
+    
+    def __init__(self, servicer, max_in_flight=1, max_batch=MB_MAX_BATCH, max_wait_us=MB_MAX_WAIT_US):
+        self.servicer = servicer
+        self.max_in_flight = max_in_flight
+        self.max_batch = max_batch
+        self.max_wait = max_wait_us / 1e6
+        self.queue = None
+        self.worker = None
+        self.slots = None
+        self.in_flight = set()
+    
+    async def predict(self, features):
+        """Queue one validated feature row for the next batch and wait for its value"""
+        if self.worker is None:
+            self.queue = asyncio.Queue()
+            self.slots = asyncio.Semaphore(self.max_in_flight)
+            self.worker = asyncio.create_task(self._run())
+        fut = asyncio.get_running_loop().create_future()
+        await self.queue.put((features, fut))
+        return await fut
+    
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            # Block for the first row, then drain what is queued until the
+            # batch is full or the wait deadline passes
+            features, fut = await self.queue.get()
+            await self.slots.acquire()
+            rows = [features]
+            pending = [fut]
+            deadline = loop.time() + self.max_wait
+            while len(rows) < self.max_batch:
+                try:
+                    features, fut = self.queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        features, fut = await asyncio.wait_for(self.queue.get(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+                rows.append(features)
+                pending.append(fut)
+            
+            task = asyncio.create_task(self._flush(rows, pending))
+            self.in_flight.add(task)
+            task.add_done_callback(self.in_flight.discard)
+    
+    async def _flush(self, rows, pending):
+        """Run one batch and hand each row's value to its waiter, then free its slot"""
+        try:
+            values = await self.servicer.infer(rows)
+        except Exception as e:
+            for fut in pending:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        finally:
+            self.slots.release()
+        
+        for fut, value in zip(pending, values):
+            if not fut.done():
+                fut.set_result(value)
+
 class NeuralServicer(neural_pb2_grpc.NeuralServiceServicer):
     """gRPC servicer implementation for neural network inference using ONNX Runtime"""
     
-    def __init__(self, model_path):
+    def __init__(self, model_path, max_workers=1):
         """Initialize service with an ONNX model"""
         logger.info(f"ONNX model path received: {model_path}")
         logger.info(f"Attempting to load ONNX model: {model_path}")
@@ -34,8 +167,9 @@ class NeuralServicer(neural_pb2_grpc.NeuralServiceServicer):
             providers = [
                 'CPUExecutionProvider'
             ]
-            self.ort_session = ort.InferenceSession(model_path, providers=providers)
-            logger.info(f"Successfully loaded ONNX model from {model_path}")
+            load_path, so = session_options(model_path, max_workers)
+            self.ort_session = ort.InferenceSession(load_path, sess_options=so, providers=providers)
+            logger.info(f"Successfully loaded ONNX model from {load_path}")
             logger.info(f"ONNX session providers: {self.ort_session.get_providers()}")
 
             # Log detailed provider options
@@ -64,6 +198,11 @@ class NeuralServicer(neural_pb2_grpc.NeuralServiceServicer):
             if not self.model_input_shape or not isinstance(self.model_input_shape[-1], int) or self.model_input_shape[-1] <= 0:
                 raise ValueError(f"Invalid feature size in model input shape: {self.model_input_shape}")
             self.model_input_feature_size = self.model_input_shape[-1]
+            # Outputs are written into preallocated buffers, so their width must be static too
+            output_shape = outputs_meta[0].shape
+            if not output_shape or not isinstance(output_shape[-1], int) or output_shape[-1] <= 0:
+                raise ValueError(f"Invalid feature size in model output shape: {output_shape}")
+            self.model_output_feature_size = output_shape[-1]
 
             logger.info(f"Initialized ONNX session. Input: '{self.input_name}' (Shape: {self.model_input_shape}), "
                         f"Output: '{self.output_name}' (Shape: {outputs_meta[0].shape}), "
@@ -74,16 +213,58 @@ class NeuralServicer(neural_pb2_grpc.NeuralServiceServicer):
             # Propagate exception to prevent service from starting with a bad model
             raise
 
+        # RPCs are handled on the event loop; only session runs go to this pool.
+        # Each of its threads owns an IOBinding plus input/output buffers, grown
+        # to the largest batch seen and reused, so rows are copied straight from
+        # the protobuf and ORT writes results in place
+        self._ort_pool = futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="onnx")
+        self._buf_tls = threading.local()
+        self.batcher = MicroBatcher(self, max_in_flight=max_workers) if MB_MAX_BATCH > 1 else None
+        self._model_info = self._build_model_info()
+        
         # Performance metrics
         self.total_requests = 0
         self.total_batch_size = 0
-        self.inference_time = 0
+        self.timed_requests = 0
+        self.inference_time_ns = 0
         self.start_time = time.time()
     
-    def Predict(self, request, context):
+    def _bound_buffers(self, rows):
+        """Return this thread's (input, output, io_binding) sized to `rows`"""
+        tls = self._buf_tls
+        buf = getattr(tls, 'buf', None)
+        if buf is None:
+            tls.binding = self.ort_session.io_binding()
+        if buf is None or rows > buf.shape[0]:
+            buf = tls.buf = np.empty((rows, self.model_input_feature_size), dtype=np.float32)
+            tls.out = np.empty((rows, self.model_output_feature_size), dtype=np.float32)
+        return buf[:rows], tls.out[:rows], tls.binding
+    
+    def _run_bound(self, input_data, output_data, binding):
+        """Run the session on `input_data`, writing into `output_data`"""
+        binding.bind_cpu_input(self.input_name, input_data)
+        binding.bind_output(self.output_name, "cpu", 0, np.float32, list(output_data.shape), output_data.ctypes.data)
+        self.ort_session.run_with_iobinding(binding)
+    
+    def _infer_rows(self, rows):
+        """Run validated feature rows on this thread's binding; returns each row's first output"""
+        input_data, output_data, binding = self._bound_buffers(len(rows))
+        for row, features in zip(input_data, rows):
+            copy_features(row, features)
+        self._run_bound(input_data, output_data, binding)
+        # tolist() converts the column to Python floats in one C loop
+        return output_data[:, 0].tolist()
+    
+    async def infer(self, rows):
+        """Run `rows` on the ORT pool without blocking the event loop"""
+        return await asyncio.get_running_loop().run_in_executor(self._ort_pool, self._infer_rows, rows)
+    
+    async def Predict(self, request, context):
         """Handle single prediction request"""
-        start_time = time.time()
         self.total_requests += 1
+        timed = not self.total_requests & STATS_SAMPLE_MASK
+        if timed:
+            start_ns = time.perf_counter_ns()
         
         if not hasattr(self, 'ort_session') or self.ort_session is None:
             logger.error("ONNX session not initialized.")
@@ -105,21 +286,13 @@ class NeuralServicer(neural_pb2_grpc.NeuralServiceServicer):
             return neural_pb2.PredictResponse()
 
         try:
-            # Convert features to NumPy array, reshape, and ensure correct type
-            input_data = np.array(list(request.features), dtype=np.float32).reshape(1, self.model_input_feature_size)
-            
-            # Prepare input dictionary for ONNX Runtime
-            inputs_dict = {self.input_name: input_data}
-            
             logger.debug(f"Predict: Available session providers for inference: {self.ort_session.get_providers()}")
-            # Run inference
-            # The result is a list of NumPy arrays, one for each requested output name.
-            # Since we request one output (self.output_name), results will have one element.
-            onnx_results = self.ort_session.run([self.output_name], inputs_dict)
-            
             # Extract the scalar value. For rps_value1.onnx, output shape is [1,1]
-            # onnx_results[0] is a np.array like [[-0.12345]]
-            value = float(onnx_results[0][0][0])
+            if self.batcher is not None:
+                # Runs as one row of a batch shared with concurrent Predict calls
+                value = await self.batcher.predict(request.features)
+            else:
+                value, = await self.infer([request.features])
 
             # Create response
             response = neural_pb2.PredictResponse()
@@ -134,14 +307,18 @@ class NeuralServicer(neural_pb2_grpc.NeuralServiceServicer):
             return neural_pb2.PredictResponse()
         
         # Measure performance
-        self.inference_time += time.time() - start_time
+        if timed:
+            self.inference_time_ns += time.perf_counter_ns() - start_ns
+            self.timed_requests += 1
         return response
     
-    def BatchPredict(self, request, context):
+    async def BatchPredict(self, request, context):
         """Handle batch prediction request"""
-        start_time = time.time()
         batch_size = len(request.inputs)
         self.total_requests += 1 # Count as one gRPC request
+        timed = not self.total_requests & STATS_SAMPLE_MASK
+        if timed:
+            start_ns = time.perf_counter_ns()
         self.total_batch_size += batch_size # Accumulate total items processed
         
         if not hasattr(self, 'ort_session') or self.ort_session is None:
@@ -156,39 +333,31 @@ class NeuralServicer(neural_pb2_grpc.NeuralServiceServicer):
             context.set_details("Empty batch provided")
             return neural_pb2.BatchPredictResponse()
         
-        batch_features_list = []
+        # Validate on the event loop; the rows are copied into the bound buffer
+        # by the ORT pool thread that runs them
+        feature_size = self.model_input_feature_size
+        rows = []
         for i, inp in enumerate(request.inputs):
-            if len(inp.features) != self.model_input_feature_size:
-                error_msg = f"Incorrect number of features for item {i} in batch. Expected {self.model_input_feature_size}, got {len(inp.features)}."
+            features = inp.features
+            if len(features) != feature_size:
+                error_msg = f"Incorrect number of features for item {i} in batch. Expected {feature_size}, got {len(features)}."
                 logger.error(error_msg)
                 context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
                 context.set_details(error_msg)
                 return neural_pb2.BatchPredictResponse()
-            batch_features_list.append(list(inp.features))
+            rows.append(features)
 
         try:
-            # Convert list of feature lists to NumPy array, reshape, and ensure correct type
-            input_data = np.array(batch_features_list, dtype=np.float32).reshape(batch_size, self.model_input_feature_size)
-            
-            # Prepare input dictionary for ONNX Runtime
-            inputs_dict = {self.input_name: input_data}
-            
             logger.debug(f"BatchPredict: Available session providers for inference: {self.ort_session.get_providers()}")
-            # Run inference
-            # The result is a list of NumPy arrays, one for each requested output name.
-            onnx_results = self.ort_session.run([self.output_name], inputs_dict)
-            
-            # onnx_results[0] is a np.array like [[val1], [val2], ..., [val_batch_size]]
-            # Each val is typically a list/array itself, e.g., [0.123] for a scalar output model
-            batch_output_values = onnx_results[0]
+            # Assuming the model outputs one scalar per input item in the batch,
+            # e.g. [[val1], [val2], ..., [val_batch_size]]; infer returns the column
+            values = await self.infer(rows)
 
             response = neural_pb2.BatchPredictResponse()
-            for i in range(batch_size):
-                individual_output = neural_pb2.PredictResponse()
-                # Assuming the model outputs one scalar per input item in the batch
-                individual_output.value = float(batch_output_values[i][0])
-                # individual_output.best_move and .probabilities not set for value net
-                response.outputs.append(individual_output)
+            add_output = response.outputs.add
+            for value in values:
+                # .best_move and .probabilities not set for value net
+                add_output().value = value
 
         except Exception as e:
             logger.error(f"Error during ONNX BatchPredict inference: {e}")
@@ -197,11 +366,19 @@ class NeuralServicer(neural_pb2_grpc.NeuralServiceServicer):
             return neural_pb2.BatchPredictResponse()
         
         # Measure performance
-        self.inference_time += time.time() - start_time
+        if timed:
+            self.inference_time_ns += time.perf_counter_ns() - start_ns
+            self.timed_requests += 1
         return response
     
-    def GetModelInfo(self, request, context):
+    async def GetModelInfo(self, request, context):
         """Provide information about the loaded ONNX model"""
+        # The model is fixed after __init__; gRPC serializes the shared message
+        # without mutating it
+        return self._model_info
+    
+    def _build_model_info(self):
+        """Describe the loaded ONNX model as a ModelInfoResponse"""
         response = neural_pb2.ModelInfoResponse()
         response.framework = "onnxruntime"
         response.hidden_size = -1 # Typically not well-defined for a generic ONNX model graph
@@ -253,7 +430,7 @@ class NeuralServicer(neural_pb2_grpc.NeuralServiceServicer):
             
             logger.info(f"GetModelInfo: InputSize={response.input_size}, OutputSize={response.output_size}, Device='{response.device}', Framework='{response.framework}'")
         else:
-            logger.warning("GetModelInfo called but ONNX session not available.")
+            logger.warning("ONNX session not available for GetModelInfo.")
             response.input_size = -1
             response.output_size = -1
             response.device = "N/A"
@@ -265,44 +442,41 @@ class NeuralServicer(neural_pb2_grpc.NeuralServiceServicer):
         elapsed = time.time() - self.start_time
         
         if self.total_requests > 0:
-            avg_inference = (self.inference_time * 1000) / self.total_requests
+            avg_inference = self.inference_time_ns / 1e6 / max(1, self.timed_requests)
             logger.info(f"Total requests: {self.total_requests}")
             logger.info(f"Avg batch size: {self.total_batch_size / self.total_requests:.2f}")
-            logger.info(f"Avg inference time: {avg_inference:.2f} ms")
+            logger.info(f"Avg inference time: {avg_inference:.2f} ms (sampled over {self.timed_requests} requests)")
             logger.info(f"Service uptime: {elapsed:.2f} s")
         else:
             logger.info("No requests processed.")
 
-def serve(port, model_path, max_workers=10):
-    """Start the gRPC server"""
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=max_workers))
-    neural_pb2_grpc.add_NeuralServiceServicer_to_server(
-        NeuralServicer(model_path=model_path), server # Pass model_path
-    )
+async def serve_async(port, model_path, max_workers=10, precision="int8"):
+    """Run the asyncio gRPC server until cancelled"""
+    model_path = resolve_model_path(model_path, precision)
+    # Only read by OpenMP builds of ORT; keeps their idle workers from spinning
+    os.environ.setdefault("OMP_WAIT_POLICY", "PASSIVE")
+    server = grpc.aio.server()
+    servicer = NeuralServicer(model_path=model_path, max_workers=max_workers)
+    neural_pb2_grpc.add_NeuralServiceServicer_to_server(servicer, server)
     server.add_insecure_port(f'[::]:{port}')
-    server.start()
+    await server.start()
     logger.info(f"Server started on port {port} with ONNX model: {model_path}")
     
     try:
-        while True:
-            time.sleep(60 * 60 * 24)  # Keep server alive
-    except KeyboardInterrupt:
+        await server.wait_for_termination()
+    finally:
         logger.info("Server stopping...")
-        # Create an instance of NeuralServicer to call print_stats
-        # This is a bit of a hack; stats ideally would be managed by the server instance or a separate class.
-        # For simplicity, we re-fetch model_path if needed or use the global args.
-        temp_servicer_for_stats = NeuralServicer(model_path=model_path) 
-        temp_servicer_for_stats.total_requests = server.total_requests if hasattr(server, 'total_requests') else 0 # This won't work as server doesn't own these
-        temp_servicer_for_stats.total_batch_size = server.total_batch_size if hasattr(server, 'total_batch_size') else 0
-        temp_servicer_for_stats.inference_time = server.inference_time if hasattr(server, 'inference_time') else 0
-        # A better way for stats on shutdown would be to have NeuralServicer instance accessible
-        # or pass a stats object to it.
-        # For now, the stats printed on shutdown will be from a new instance, so likely zero.
-        # The running stats are printed by the servicer instance tied to the server, but not easily on shutdown here.
-        logger.warning("Stats on shutdown might be inaccurate due to instance scoping. Check periodic logs if enabled.")
-        server.stop(0)
+        servicer.print_stats()
+        await server.stop(0)
         logger.info("Server stopped.")
 
+def serve(port, model_path, max_workers=10, precision="int8"):
+    """Start the gRPC server"""
+    try:
+        asyncio.run(serve_async(port, model_path, max_workers, precision))
+    except KeyboardInterrupt:
+        pass
+
 if __name__ == '__main__':
     import argparse
     parser = argparse.ArgumentParser(description="ONNX Neural Service")
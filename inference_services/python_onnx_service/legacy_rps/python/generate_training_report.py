@@ -3,10 +3,17 @@
 import argparse
 import os
 import re
+from collections import Counter
+import matplotlib
+matplotlib.use("Agg")  # headless: skip GUI backend probing
 import matplotlib.pyplot as plt
 import numpy as np
 from datetime import datetime
 
+# "- Key: value" lines from the Configuration and Summary Statistics sections
+_FIELD_RE = re.compile(r'^- ([^:\n]+): (.+)$', re.MULTILINE)
+_GAME_RE = re.compile(r'Game (\d+): Winner=(.+), Moves=(\d+)')
+
 def parse_results_file(file_path):
     """Parse the training results file."""
     results = {}
@@ -15,69 +22,63 @@ def parse_results_file(file_path):
     with open(file_path, 'r') as f:
         content = f.read()
     
+    # Results sections appear before "Game Results:", so one scan of that
+    # prefix picks up every configuration and summary field
+    games_pos = content.find('Game Results:')
+    fields = dict(_FIELD_RE.findall(content, 0, games_pos if games_pos >= 0 else len(content)))
+    
     # Extract configuration
-    config_match = re.search(r'Configuration:\n(.*?)\n\n', content, re.DOTALL)
-    if config_match:
-        config_section = config_match.group(1)
-        results['iterations'] = int(re.search(r'- MCTS Iterations: (\d+)', config_section).group(1))
-        results['games'] = int(re.search(r'- Self-play Games: (\d+)', config_section).group(1))
-        results['batch_size'] = int(re.search(r'- Batch Size: (\d+)', config_section).group(1))
-        results['service'] = re.search(r'- Service: (.+)', config_section).group(1)
+    if 'MCTS Iterations' in fields:
+        results['iterations'] = int(fields['MCTS Iterations'])
+        results['games'] = int(fields['Self-play Games'])
+        results['batch_size'] = int(fields['Batch Size'])
+        results['service'] = fields['Service']
     
     # Extract summary statistics
-    stats_match = re.search(r'Summary Statistics:\n(.*?)\n\n', content, re.DOTALL)
-    if stats_match:
-        stats_section = stats_match.group(1)
-        results['total_duration'] = re.search(r'- Total Duration: (.+)', stats_section).group(1)
-        results['avg_game_duration'] = re.search(r'- Avg. Game Duration: (.+)', stats_section).group(1)
-        results['total_nodes'] = int(re.search(r'- Total Nodes: (\d+)', stats_section).group(1))
-        results['total_moves'] = int(re.search(r'- Total Moves: (\d+)', stats_section).group(1))
-        results['nodes_per_second'] = float(re.search(r'- Nodes/Second: ([\d.]+)', stats_section).group(1))
-        results['moves_per_second'] = float(re.search(r'- Moves/Second: ([\d.]+)', stats_section).group(1))
+    if 'Total Duration' in fields:
+        results['total_duration'] = fields['Total Duration']
+        results['avg_game_duration'] = fields['Avg. Game Duration']
+        results['total_nodes'] = int(fields['Total Nodes'])
+        results['total_moves'] = int(fields['Total Moves'])
+        results['nodes_per_second'] = float(fields['Nodes/Second'])
+        results['moves_per_second'] = float(fields['Moves/Second'])
     
     # Extract game results
-    game_section = re.search(r'Game Results:\n(.*)', content, re.DOTALL)
-    if game_section:
-        game_lines = game_section.group(1).strip().split('\n')
-        for line in game_lines:
-            match = re.search(r'Game (\d+): Winner=(.+), Moves=(\d+)', line)
-            if match:
-                game_number = int(match.group(1))
-                winner = match.group(2)
-                moves = int(match.group(3))
-                game_results.append({
-                    'game': game_number,
-                    'winner': winner,
-                    'moves': moves
-                })
+    if games_pos >= 0:
+        for match in _GAME_RE.finditer(content, games_pos):
+            game_results.append({
+                'game': int(match.group(1)),
+                'winner': match.group(2),
+                'moves': int(match.group(3))
+            })
     
     results['games_data'] = game_results
     return results
 
+_LOG_RE = re.compile(r'Game (\d+) completed in (.+) \((\d+) moves, (.+)/move\)')
+# Go-style duration components, e.g. "1m2.5s" or "350ms"
+_DURATION_PART_RE = re.compile(r'([\d.]+)(ms|µs|us|ns|h|m|s)')
+_DURATION_UNITS = {'h': 3600.0, 'm': 60.0, 's': 1.0, 'ms': 1e-3, 'µs': 1e-6, 'us': 1e-6, 'ns': 1e-9}
+
+def parse_duration_seconds(duration):
+    """Convert a Go duration string to seconds."""
+    return sum(float(value) * _DURATION_UNITS[unit]
+               for value, unit in _DURATION_PART_RE.findall(duration))
+
 def parse_log_file(file_path):
     """Parse the training log file to extract per-game metrics."""
     game_metrics = []
     
     with open(file_path, 'r') as f:
         for line in f:
-            match = re.search(r'Game (\d+) completed in (.+) \((\d+) moves, (.+)/move\)', line)
+            # Cheap substring test rejects most log lines before the regex runs
+            if ' completed in ' not in line:
+                continue
+            match = _LOG_RE.search(line)
             if match:
                 game_number = int(match.group(1))
-                duration = match.group(2)
+                duration_seconds = parse_duration_seconds(match.group(2))
                 moves = int(match.group(3))
-                time_per_move = match.group(4)
-                
-                # Convert durations to seconds for plotting
-                duration_seconds = 0
-                if 'ms' in duration:
-                    duration_seconds = float(duration.replace('ms', '')) / 1000
-                elif 's' in duration:
-                    duration_seconds = float(duration.replace('s', ''))
-                elif 'm' in duration:
-                    parts = duration.split('m')
-                    duration_seconds = float(parts[0]) * 60
-                    if len(parts) > 1 and 's' in parts[1]:
-                        duration_seconds += float(parts[1].replace('s', ''))
                 
                 game_metrics.append({
                     'game': game_number,
@@ -88,64 +89,55 @@ def parse_log_file(file_path):
     
     return game_metrics
 
+GAME_METRICS_DTYPE = np.dtype([
+    ('game', np.int32),
+    ('duration_seconds', np.float64),
+    ('moves', np.int32),
+    ('seconds_per_move', np.float64),
+])
+
 def generate_plots(results, game_metrics, output_dir):
     """Generate plots from the results data."""
     # Create plots directory
     plots_dir = os.path.join(output_dir, 'plots')
     os.makedirs(plots_dir, exist_ok=True)
     
-    # Game duration plot
-    plt.figure(figsize=(10, 6))
-    games = [gm['game'] for gm in game_metrics]
-    durations = [gm['duration_seconds'] for gm in game_metrics]
-    plt.plot(games, durations, marker='o', linestyle='-', color='blue')
-    plt.title('Game Duration by Game Number')
-    plt.xlabel('Game Number')
-    plt.ylabel('Duration (seconds)')
-    plt.grid(True)
-    plt.savefig(os.path.join(plots_dir, 'game_duration.png'))
-    plt.close()
+    # One pass over the per-game dicts into columnar arrays for all plots
+    metrics = np.fromiter(
+        ((gm['game'], gm['duration_seconds'], gm['moves'], gm['seconds_per_move'])
+         for gm in game_metrics),
+        dtype=GAME_METRICS_DTYPE,
+        count=len(game_metrics),
+    )
+    games = metrics['game']
     
-    # Moves per game plot
-    plt.figure(figsize=(10, 6))
-    games = [gm['game'] for gm in game_metrics]
-    moves = [gm['moves'] for gm in game_metrics]
-    plt.plot(games, moves, marker='o', linestyle='-', color='green')
-    plt.title('Moves per Game')
-    plt.xlabel('Game Number')
-    plt.ylabel('Number of Moves')
-    plt.grid(True)
-    plt.savefig(os.path.join(plots_dir, 'moves_per_game.png'))
-    plt.close()
-    
-    # Time per move plot
-    plt.figure(figsize=(10, 6))
-    games = [gm['game'] for gm in game_metrics]
-    time_per_move = [gm['seconds_per_move'] for gm in game_metrics]
-    plt.plot(games, time_per_move, marker='o', linestyle='-', color='red')
-    plt.title('Time per Move by Game Number')
-    plt.xlabel('Game Number')
-    plt.ylabel('Seconds per Move')
-    plt.grid(True)
-    plt.savefig(os.path.join(plots_dir, 'time_per_move.png'))
-    plt.close()
+    # A single figure is reused for every chart; only its axes are cleared
+    fig, ax = plt.subplots(figsize=(10, 6))
+    line_plots = [
+        ('duration_seconds', 'blue', 'Game Duration by Game Number', 'Duration (seconds)', 'game_duration.png'),
+        ('moves', 'green', 'Moves per Game', 'Number of Moves', 'moves_per_game.png'),
+        ('seconds_per_move', 'red', 'Time per Move by Game Number', 'Seconds per Move', 'time_per_move.png'),
+    ]
+    for column, color, title, ylabel, filename in line_plots:
+        ax.clear()
+        ax.plot(games, metrics[column], marker='o', linestyle='-', color=color)
+        ax.set_title(title)
+        ax.set_xlabel('Game Number')
+        ax.set_ylabel(ylabel)
+        ax.grid(True)
+        fig.savefig(os.path.join(plots_dir, filename))
     
     # Winner distribution pie chart
-    plt.figure(figsize=(8, 8))
-    winner_counts = {}
-    for game in results['games_data']:
-        winner = game['winner']
-        if winner not in winner_counts:
-            winner_counts[winner] = 0
-        winner_counts[winner] += 1
-    
-    labels = list(winner_counts.keys())
-    sizes = list(winner_counts.values())
-    plt.pie(sizes, labels=labels, autopct='%1.1f%%', startangle=90, colors=['blue', 'red', 'green', 'purple'])
-    plt.axis('equal')
-    plt.title('Game Winner Distribution')
-    plt.savefig(os.path.join(plots_dir, 'winner_distribution.png'))
-    plt.close()
+    winner_counts = Counter(game['winner'] for game in results['games_data'])
+    labels = list(winner_counts)
+    sizes = np.fromiter(winner_counts.values(), dtype=np.int64, count=len(winner_counts))
+    ax.clear()
+    fig.set_size_inches(8, 8)
+    ax.pie(sizes, labels=labels, autopct='%1.1f%%', startangle=90, colors=['blue', 'red', 'green', 'purple'])
+    ax.axis('equal')
+    ax.set_title('Game Winner Distribution')
+    fig.savefig(os.path.join(plots_dir, 'winner_distribution.png'))
+    plt.close(fig)
     
     return plots_dir
 
@@ -270,11 +262,11 @@ def generate_html_report(results, game_metrics, plots_dir, output_file):
                 </tr>
     """
     
-    # Add rows for each game
-    for i, game in enumerate(results['games_data']):
-        if i < len(game_metrics):
-            metrics = game_metrics[i]
-            html_content += f"""
+    # Collect rows and join once instead of growing one string per game;
+    # zip stops at the shorter list, as the old index check did
+    parts = [html_content]
+    for game, metrics in zip(results['games_data'], game_metrics):
+        parts.append(f"""
                 <tr>
                     <td>{game['game']}</td>
                     <td>{game['winner']}</td>
@@ -282,14 +274,15 @@ def generate_html_report(results, game_metrics, plots_dir, output_file):
                     <td>{metrics['duration_seconds']:.2f}</td>
                     <td>{metrics['seconds_per_move']:.4f}</td>
                 </tr>
-            """
+            """)
     
-    html_content += """
+    parts.append("""
             </table>
         </div>
     </body>
     </html>
-    """
+    """)
+    html_content = "".join(parts)
     
     with open(output_file, 'w') as f:
         f.write(html_content)
@@ -3,11 +3,13 @@ import os
 import sys
 import time
 import argparse
+import asyncio
+import functools
 import logging
 import platform
 import numpy as np
-import tensorflow as tf
 import grpc
+import grpc.aio
 from concurrent import futures
 
 # Add the proto directory to the path so we can import the generated modules
@@ -29,29 +31,40 @@ if is_apple_silicon:
     # Explicitly enable Metal API
     os.environ['DEVICE_NAME'] = 'metal'
 
-# Check for GPU availability
-physical_devices = tf.config.list_physical_devices('GPU')
-if physical_devices:
-    logger.info(f"Found {len(physical_devices)} GPUs: {physical_devices}")
-    # Configure TensorFlow to use memory growth to avoid allocating all GPU memory at once
-    try:
-        for gpu in physical_devices:
-            tf.config.experimental.set_memory_growth(gpu, True)
-        logger.info("Memory growth enabled for GPUs")
-    except Exception as e:
-        logger.error(f"Error configuring GPU: {e}")
-else:
-    logger.warning("No GPU found, using CPU")
-
-# If on Apple Silicon, verify Metal is being used
-if is_apple_silicon:
-    # This will force TensorFlow to initialize and print out device placements
-    with tf.device('/device:GPU:0'):
+@functools.lru_cache(maxsize=None)
+def _get_devices():
+    """Import TensorFlow and configure its GPUs on first use"""
+    # Deferred so --help and argument errors don't pay the multi-second import
+    import tensorflow as tf
+    
+    physical_devices = tf.config.list_physical_devices('GPU')
+    if physical_devices:
+        logger.info(f"Found {len(physical_devices)} GPUs: {physical_devices}")
+        # Configure TensorFlow to use memory growth to avoid allocating all GPU memory at once
         try:
-            tf.random.normal([1])
-            logger.info("Successfully initialized Metal GPU.")
+            for gpu in physical_devices:
+                tf.config.experimental.set_memory_growth(gpu, True)
+            logger.info("Memory growth enabled for GPUs")
         except Exception as e:
-            logger.error(f"Failed to use Metal GPU: {e}")
+            logger.error(f"Error configuring GPU: {e}")
+    else:
+        logger.warning("No GPU found, using CPU")
+    
+    # If on Apple Silicon, verify Metal is being used
+    if is_apple_silicon:
+        # This will force TensorFlow to initialize and print out device placements
+        with tf.device('/device:GPU:0'):
+            try:
+                tf.random.normal([1])
+                logger.info("Successfully initialized Metal GPU.")
+            except Exception as e:
+                logger.error(f"Failed to use Metal GPU: {e}")
+    
+    return physical_devices
+
+# Batch sizes the compiled forward pass is traced for; larger batches are
+# padded to a multiple of the last one
+BATCH_BUCKETS = (1, 8, 32, 128)
 
 class RPSNeuralNetwork:
     """Neural network implementation for RPS game"""
@@ -65,14 +78,18 @@ class RPSNeuralNetwork:
         
         # Build and compile the model
         self.model = self.build_model()
-        self.device = "gpu" if physical_devices else "cpu"
+        self._infer = self.build_infer()
+        self.warm_up()
+        self.device = "gpu" if _get_devices() else "cpu"
         logger.info(f"Created {model_type} model with {input_size} inputs, {hidden_size} hidden, "
                    f"{output_size} outputs on {self.device}")
     
     def build_model(self):
         """Build the TensorFlow model architecture"""
+        import tensorflow as tf
+        
         # Use Metal GPU if available on Apple Silicon
-        device_strategy = '/device:GPU:0' if physical_devices else '/CPU:0'
+        device_strategy = '/device:GPU:0' if _get_devices() else '/CPU:0'
         
         with tf.device(device_strategy):
             model = tf.keras.Sequential([
@@ -89,10 +106,38 @@ class RPSNeuralNetwork:
         
         return model
     
+    def build_infer(self):
+        """Compile the forward pass into a graph function"""
+        import tensorflow as tf
+        
+        # model.predict() wraps every call in a Dataset adapter and callbacks,
+        # which dominates the cost of a net this small. XLA fuses the
+        # Dense/activation chain, but isn't available on the Metal plugin.
+        return tf.function(lambda x: self.model(x, training=False),
+                           jit_compile=not is_apple_silicon)
+    
+    def warm_up(self):
+        """Trace the forward pass for every batch bucket before serving"""
+        for bucket in BATCH_BUCKETS:
+            self._infer(np.zeros((bucket, self.input_size), dtype=np.float32))
+    
+    def run(self, input_array):
+        """Run the compiled forward pass on a float32 batch, padded to a bucket size"""
+        # Padding to a few fixed batch sizes bounds the number of traced graphs
+        n = input_array.shape[0]
+        bucket = next((b for b in BATCH_BUCKETS if b >= n), None)
+        if bucket is None:
+            bucket = -(-n // BATCH_BUCKETS[-1]) * BATCH_BUCKETS[-1]
+        if bucket != n:
+            padded = np.zeros((bucket, input_array.shape[1]), dtype=np.float32)
+            padded[:n] = input_array
+            input_array = padded
+        return self._infer(input_array).numpy()[:n]
+    
     def predict(self, features):
         """Run inference on a single input"""
-        input_array = np.array(features).reshape(1, -1)
-        result = self.model.predict(input_array, verbose=0)
+        input_array = np.asarray(features, dtype=np.float32).reshape(1, -1)
+        result = self.run(input_array)
         
         if self.model_type == "policy":
             best_move = np.argmax(result[0])
@@ -102,21 +147,15 @@ class RPSNeuralNetwork:
     
     def batch_predict(self, batch_features):
         """Run inference on a batch of inputs"""
-        # Convert list of feature lists to numpy array
-        input_array = np.array(batch_features)
-        results = self.model.predict(input_array, verbose=0)
-        
-        outputs = []
+        # Accepts a float32 array (no copy) or a list of feature lists
+        input_array = np.ascontiguousarray(batch_features, dtype=np.float32)
+        results = self.run(input_array)
         
         if self.model_type == "policy":
-            for i in range(len(batch_features)):
-                best_move = np.argmax(results[i])
-                outputs.append((results[i], 0.0, best_move))
+            best_moves = results.argmax(axis=1).tolist()
+            return [(row, 0.0, best_move) for row, best_move in zip(results, best_moves)]
         else:  # value network
-            for i in range(len(batch_features)):
-                outputs.append(([], float(results[i][0]), 0))
-                
-        return outputs
+            return [([], value, 0) for value in results[:, 0].tolist()]
     
     def load_weights(self, weights_path):
         """Load weights from a saved file"""
@@ -128,6 +167,71 @@ class RPSNeuralNetwork:
             logger.error(f"Error loading weights: {e}")
             return False
 
+# Concurrent requests for the same network are coalesced into one model call,
+# flushed after BATCH_FLUSH_MS or once BATCH_MAX_ROWS rows are queued
+BATCH_FLUSH_MS = 2.0
+BATCH_MAX_ROWS = 32
+
+class PredictBatcher:
+    """Coalesces concurrent prediction requests for one network"""
+    
+    def __init__(self, network, max_rows=BATCH_MAX_ROWS, flush_ms=BATCH_FLUSH_MS):
+        self.network = network
+        self.max_rows = max_rows
+        self.flush_ms = flush_ms
+        self.queue = None
+        self.worker = None
+    
+    async def predict(self, batch_features):
+        """Queue a float32 (rows, features) array for the next coalesced batch and wait for its results"""
+        if self.worker is None:
+            self.queue = asyncio.Queue()
+            self.worker = asyncio.create_task(self._run())
+        fut = asyncio.get_running_loop().create_future()
+        await self.queue.put((batch_features, fut))
+        return await fut
+    
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            # Block for the first request, then drain what is queued until the
+            # batch is full or the flush deadline passes
+            rows, fut = await self.queue.get()
+            pending = [(fut, len(rows))]
+            chunks = [rows]
+            batch_rows = len(rows)
+            deadline = loop.time() + self.flush_ms / 1000
+            while batch_rows < self.max_rows:
+                try:
+                    rows, fut = self.queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        rows, fut = await asyncio.wait_for(self.queue.get(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+                pending.append((fut, len(rows)))
+                chunks.append(rows)
+                batch_rows += len(rows)
+            batch = chunks[0] if len(chunks) == 1 else np.concatenate(chunks)
+            
+            # The model call blocks, so it runs on the default executor
+            try:
+                results = await loop.run_in_executor(None, self.network.batch_predict, batch)
+            except Exception as e:
+                for fut, _ in pending:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+            
+            idx = 0
+            for fut, count in pending:
+                if not fut.done():
+                    fut.set_result(results[idx:idx + count])
+                idx += count
+
 class NeuralServicer(neural_pb2_grpc.NeuralServiceServicer):
     """gRPC servicer implementation for neural network inference"""
     
@@ -148,13 +252,16 @@ class NeuralServicer(neural_pb2_grpc.NeuralServiceServicer):
             model_type="value"
         )
         
+        self.policy_batcher = PredictBatcher(self.policy_net)
+        self.value_batcher = PredictBatcher(self.value_net)
+        
         # Performance metrics
         self.total_requests = 0
         self.total_batch_size = 0
         self.inference_time = 0
         self.start_time = time.time()
     
-    def Predict(self, request, context):
+    async def Predict(self, request, context):
         """Handle single prediction request"""
         start_time = time.time()
         self.total_requests += 1
@@ -167,9 +274,18 @@ class NeuralServicer(neural_pb2_grpc.NeuralServiceServicer):
         
         # Select appropriate network
         network = self.policy_net if request.model_type == "policy" else self.value_net
+        batcher = self.policy_batcher if network is self.policy_net else self.value_batcher
         
-        # Run prediction
-        probabilities, value, best_move = network.predict(request.features)
+        # Rows of the wrong width would fail the whole coalesced batch
+        if len(request.features) != network.input_size:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details(f"Expected {network.input_size} features, got {len(request.features)}")
+            return neural_pb2.PredictResponse()
+        
+        # Run prediction, coalesced with concurrent requests
+        features = np.empty((1, network.input_size), dtype=np.float32)
+        features[0] = request.features
+        (probabilities, value, best_move), = await batcher.predict(features)
         
         # Measure performance
         self.inference_time += time.time() - start_time
@@ -186,7 +302,7 @@ class NeuralServicer(neural_pb2_grpc.NeuralServiceServicer):
         
         return response
     
-    def BatchPredict(self, request, context):
+    async def BatchPredict(self, request, context):
         """Handle batch prediction request"""
         start_time = time.time()
         batch_size = len(request.inputs)
@@ -201,12 +317,21 @@ class NeuralServicer(neural_pb2_grpc.NeuralServiceServicer):
         
         # Select appropriate network
         network = self.policy_net if request.model_type == "policy" else self.value_net
+        batcher = self.policy_batcher if network is self.policy_net else self.value_batcher
         
-        # Prepare batch features
-        batch_features = [list(input_features.features) for input_features in request.inputs]
+        # Rows of the wrong width would fail the whole coalesced batch
+        if any(len(input_features.features) != network.input_size for input_features in request.inputs):
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details(f"Every input must have {network.input_size} features")
+            return neural_pb2.BatchPredictResponse()
+        
+        # Prepare batch features: each repeated field is bulk-copied into its row
+        batch_features = np.empty((batch_size, network.input_size), dtype=np.float32)
+        for i, input_features in enumerate(request.inputs):
+            batch_features[i] = input_features.features
         
-        # Run batch prediction
-        batch_results = network.batch_predict(batch_features)
+        # Run batch prediction, coalesced with concurrent requests
+        batch_results = await batcher.predict(batch_features)
         
         # Measure performance
         self.inference_time += time.time() - start_time
@@ -227,7 +352,7 @@ class NeuralServicer(neural_pb2_grpc.NeuralServiceServicer):
         
         return response
     
-    def GetModelInfo(self, request, context):
+    async def GetModelInfo(self, request, context):
         """Provide information about the loaded model"""
         # Select appropriate network
         network = self.policy_net if request.model_type == "policy" else self.value_net
@@ -237,7 +362,7 @@ class NeuralServicer(neural_pb2_grpc.NeuralServiceServicer):
         response.input_size = network.input_size
         response.hidden_size = network.hidden_size
         response.output_size = network.output_size
-        response.device = "metal" if (is_apple_silicon and physical_devices) else network.device
+        response.device = "metal" if (is_apple_silicon and _get_devices()) else network.device
         response.framework = "tensorflow"
         
         return response
@@ -253,9 +378,11 @@ class NeuralServicer(neural_pb2_grpc.NeuralServiceServicer):
             logger.info(f"Stats: {self.total_requests} requests, avg inference: {avg_inference:.2f}ms, "
                        f"avg batch: {avg_batch_size:.1f}, uptime: {elapsed:.1f}s")
 
-def serve(port, policy_weights=None, value_weights=None, max_workers=10):
-    """Start the gRPC server"""
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=max_workers))
+async def serve_async(port, policy_weights=None, value_weights=None, max_workers=10):
+    """Run the asyncio gRPC server until cancelled"""
+    # Model calls run on this pool; the event loop only handles RPCs and batching
+    asyncio.get_running_loop().set_default_executor(futures.ThreadPoolExecutor(max_workers=max_workers))
+    server = grpc.aio.server()
     servicer = NeuralServicer()
     
     # Load weights if provided
@@ -267,20 +394,26 @@ def serve(port, policy_weights=None, value_weights=None, max_workers=10):
     
     neural_pb2_grpc.add_NeuralServiceServicer_to_server(servicer, server)
     server.add_insecure_port(f'[::]:{port}')
-    server.start()
+    await server.start()
     
-    device_info = "Metal GPU" if (is_apple_silicon and physical_devices) else servicer.policy_net.device
+    device_info = "Metal GPU" if (is_apple_silicon and _get_devices()) else servicer.policy_net.device
     logger.info(f"Neural service started on port {port}")
     logger.info(f"Using device: {device_info}")
     
     try:
         # Print stats periodically
         while True:
-            time.sleep(60)
+            await asyncio.sleep(60)
             servicer.print_stats()
+    finally:
+        await server.stop(0)
+
+def serve(port, policy_weights=None, value_weights=None, max_workers=10):
+    """Start the gRPC server"""
+    try:
+        asyncio.run(serve_async(port, policy_weights, value_weights, max_workers))
     except KeyboardInterrupt:
         logger.info("Shutting down...")
-        server.stop(0)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Neural network gRPC service for RPS")
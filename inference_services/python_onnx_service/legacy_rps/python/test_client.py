@@ -3,9 +3,11 @@ import os
 import sys
 import time
 import argparse
+import asyncio
 import logging
 import numpy as np
 import grpc
+import grpc.aio
 
 # Add the proto directory to the path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -19,57 +21,79 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def generate_random_input(size):
-    """Generate random input features"""
-    return np.random.uniform(-1, 1, size).tolist()
+def generate_random_inputs(*shape):
+    """Generate random input features as a float32 array"""
+    return np.random.uniform(-1, 1, shape).astype(np.float32)
 
-def generate_random_batch(batch_size, input_size):
-    """Generate a batch of random inputs"""
-    return [generate_random_input(input_size) for _ in range(batch_size)]
+def build_predict_requests(input_size, iterations, model_type="policy"):
+    """Build one single-prediction request per iteration"""
+    return [
+        neural_pb2.PredictRequest(features=features.tolist(), model_type=model_type)
+        for features in generate_random_inputs(iterations, input_size)
+    ]
 
 def test_single_predict(stub, input_size, iterations, model_type="policy"):
     """Test single prediction performance"""
-    input_features = generate_random_input(input_size)
+    requests = build_predict_requests(input_size, iterations, model_type)
     
-    total_time = 0
-    for i in range(iterations):
-        start_time = time.time()
-        
-        request = neural_pb2.PredictRequest(
-            features=input_features,
-            model_type=model_type
-        )
-        
+    total_ns = 0
+    for request in requests:
+        start_ns = time.perf_counter_ns()
         response = stub.Predict(request)
-        
-        elapsed = time.time() - start_time
-        total_time += elapsed
+        total_ns += time.perf_counter_ns() - start_ns
     
-    avg_time = (total_time * 1000) / iterations  # ms
+    avg_time = total_ns / 1e6 / iterations  # ms
     logger.info(f"Single prediction: {iterations} iterations, avg time: {avg_time:.2f} ms")
     
     return avg_time
 
-def test_batch_predict(stub, input_size, batch_size, iterations, model_type="policy"):
-    """Test batch prediction performance"""
-    batch_features = generate_random_batch(batch_size, input_size)
+async def test_single_predict_async(addr, input_size, iterations, concurrency, model_type="policy"):
+    """Test single prediction throughput with up to `concurrency` requests in flight"""
+    requests = build_predict_requests(input_size, iterations, model_type)
+    sem = asyncio.Semaphore(concurrency)
+    latencies_ns = []
     
-    total_time = 0
-    for i in range(iterations):
-        start_time = time.time()
+    async with grpc.aio.insecure_channel(addr) as channel:
+        stub = neural_pb2_grpc.NeuralServiceStub(channel)
+        
+        async def one(request):
+            async with sem:
+                start_ns = time.perf_counter_ns()
+                await stub.Predict(request)
+                latencies_ns.append(time.perf_counter_ns() - start_ns)
         
-        # Create batch request
-        request = neural_pb2.BatchPredictRequest(
+        start_ns = time.perf_counter_ns()
+        await asyncio.gather(*(one(request) for request in requests))
+        wall_ns = time.perf_counter_ns() - start_ns
+    
+    wall_time = wall_ns / 1e9
+    avg_latency = sum(latencies_ns) / 1e6 / iterations  # ms
+    # Wall time per prediction, so the speedup compares throughput with batching
+    avg_time = wall_ns / 1e6 / iterations  # ms
+    logger.info(f"Single prediction: {iterations} requests, concurrency {concurrency}, "
+                f"avg latency: {avg_latency:.2f} ms, throughput: {iterations / wall_time:.0f} req/s "
+                f"({avg_time:.3f} ms per prediction)")
+    
+    return avg_time
+
+def test_batch_predict(stub, input_size, batch_size, iterations, model_type="policy"):
+    """Test batch prediction performance"""
+    # Build every batch request up front so only the RPC is timed
+    requests = [
+        neural_pb2.BatchPredictRequest(
             model_type=model_type,
-            inputs=[neural_pb2.InputFeatures(features=features) for features in batch_features]
+            inputs=[neural_pb2.InputFeatures(features=features) for features in batch.tolist()]
         )
-        
+        for batch in generate_random_inputs(iterations, batch_size, input_size)
+    ]
+    
+    total_ns = 0
+    for request in requests:
+        start_ns = time.perf_counter_ns()
         response = stub.BatchPredict(request)
-        
-        elapsed = time.time() - start_time
-        total_time += elapsed
+        total_ns += time.perf_counter_ns() - start_ns
     
-    avg_time = (total_time * 1000) / iterations  # ms
+    avg_time = total_ns / 1e6 / iterations  # ms
     per_prediction = avg_time / batch_size
     logger.info(f"Batch prediction: {iterations} batches of {batch_size}, "
                 f"avg batch time: {avg_time:.2f} ms, per prediction: {per_prediction:.2f} ms")
@@ -84,6 +108,10 @@ def main():
     parser.add_argument("--iterations", type=int, default=100, help="Number of iterations")
     parser.add_argument("--model-type", default="policy", choices=["policy", "value"], 
                        help="Model type (policy or value)")
+    parser.add_argument("--mode", default="async", choices=["async", "sync"],
+                       help="Send single predictions concurrently (async) or one at a time (sync)")
+    parser.add_argument("--concurrency", type=int, default=16,
+                       help="Single predictions in flight at once in async mode")
     
     args = parser.parse_args()
     
@@ -104,9 +132,14 @@ def main():
         print("\n===== Performance Test =====")
         
         # Test single prediction
-        single_avg = test_single_predict(
-            stub, args.input_size, args.iterations, args.model_type
-        )
+        if args.mode == "async":
+            single_avg = asyncio.run(test_single_predict_async(
+                args.addr, args.input_size, args.iterations, args.concurrency, args.model_type
+            ))
+        else:
+            single_avg = test_single_predict(
+                stub, args.input_size, args.iterations, args.model_type
+            )
         
         # Test batch prediction
         batch_avg, per_prediction = test_batch_predict(
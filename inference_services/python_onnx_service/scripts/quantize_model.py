@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+"""Quantize an ONNX model's weights to int8 for CPU inference.
+
+Writes <name>_int8.onnx next to the input by default; app.py picks that file
+up instead of the fp32 model whenever it exists, unless MODEL_QUANT=0, and so
+does the gRPC service unless started with --precision fp32.
+"""
+import argparse
+import os
+
+from onnxruntime.quantization import QuantType, quantize_dynamic
+
+def main():
+    default_model = os.path.join(os.path.dirname(__file__), "..", "model.onnx")
+    parser = argparse.ArgumentParser(description="Dynamic int8 quantization of an ONNX model")
+    parser.add_argument("--input", default=default_model, help="fp32 ONNX model")
+    parser.add_argument("--output", default=None, help="int8 ONNX model (default: <input>_int8.onnx)")
+    args = parser.parse_args()
+
+    root, ext = os.path.splitext(args.input)
+    output = args.output or f"{root}_int8{ext}"
+    quantize_dynamic(args.input, output, weight_type=QuantType.QInt8)
+    print(f"Quantized {args.input} -> {output}")
+
+if __name__ == "__main__":
+    main()
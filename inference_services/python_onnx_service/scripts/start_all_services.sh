@@ -20,7 +20,7 @@ pip install -r requirements.txt
 HTTP_PORT=${HTTP_PORT:-8000}
 HTTP_WORKERS=${HTTP_WORKERS:-$(sysctl -n hw.ncpu)}
 echo "Starting HTTP FastAPI on port $HTTP_PORT..."
-uvicorn app:app --workers "$HTTP_WORKERS" --host 0.0.0.0 --port "$HTTP_PORT" &
+uvicorn app:app --workers "$HTTP_WORKERS" --loop uvloop --host 0.0.0.0 --port "$HTTP_PORT" &
 HTTP_PID=$!
 echo "  PID $HTTP_PID"
 
@@ -9,10 +9,14 @@ Consolidates document analysis, categorization, and querying into a single tool.
 import os
 import sys
 import json
+import hashlib
+import heapq
+import math
 import time
 import argparse
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+from collections import OrderedDict
 from dataclasses import dataclass, asdict
 from enum import Enum
 import re
@@ -27,6 +31,7 @@ try:
         DOCS_DIR, KNOWLEDGE_BASE, ARCHIVE_DIR
     )
     from categorize_docs import DocumentCategorizer
+    from categorize_docs import DocumentAnalysis as CategorizedDocument
 except ImportError as e:
     print(f"Error importing modules: {e}")
     print("Make sure you're running from the project root directory")
@@ -43,10 +48,365 @@ CATEGORY_FOLDERS = {
     "misc": "misc"
 }
 
+# Folder names checked per file by status, query, discover and harvest
+CATEGORY_FOLDER_SET = frozenset(CATEGORY_FOLDERS.values())
+# docs/<folder> for each category, built once for cleanup and rename
+CATEGORY_FOLDER_PATHS = tuple(Path("docs") / folder for folder in CATEGORY_FOLDERS.values())
+
 def get_target_folder(category: str) -> str:
     """Get the target folder name for a category"""
     return CATEGORY_FOLDERS.get(category, category)
 
+KB_INDEX_FILE = Path(".kb_index.json")
+
+# Directories never worth descending into when hunting for documentation
+EXCLUDED_DIRS = frozenset({'node_modules', '.venv', 'venv', '.git', '__pycache__'})
+EXCLUDED_SUBPATHS = ('.cargo/registry', 'target/debug', 'target/release')
+
+def walk_markdown_entries(root: str = '.', exclude_dirs: frozenset = EXCLUDED_DIRS,
+                          exclude_subpaths: Tuple[str, ...] = EXCLUDED_SUBPATHS) -> Iterator[os.DirEntry]:
+    """Yield scandir entries of markdown files under root, pruning excluded directories as they are reached"""
+    suffixes = tuple(os.sep + sub.replace('/', os.sep) for sub in exclude_subpaths)
+    stack = [root]
+    while stack:
+        try:
+            entries = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in exclude_dirs and not entry.path.endswith(suffixes):
+                        stack.append(entry.path)
+                elif entry.name.endswith('.md') and entry.is_file(follow_symlinks=False):
+                    yield entry
+
+def walk_markdown(root: str = '.', exclude_dirs: frozenset = EXCLUDED_DIRS,
+                  exclude_subpaths: Tuple[str, ...] = EXCLUDED_SUBPATHS) -> Iterator[Path]:
+    """Yield markdown files under root, pruning excluded directories as they are reached"""
+    for entry in walk_markdown_entries(root, exclude_dirs, exclude_subpaths):
+        yield Path(entry.path)
+
+class DocEntry(NamedTuple):
+    """A markdown file known to the DocIndex"""
+    path: Path
+    size: int
+    mtime: float
+    top: Optional[str]  # top-level folder under docs/, None for docs/*.md
+    depth: int          # directories between docs/ and the file
+
+class DocIndex:
+    """Process-lifetime index of the markdown files under docs/
+    
+    Directory listings are cached per directory and persisted to
+    .kb_index.json. A refresh stats each directory once and only rescans
+    the ones whose mtime changed (files added, removed or renamed); sizes
+    of files edited in place are picked up the next time their directory
+    changes.
+    """
+    
+    _instance: Optional["DocIndex"] = None
+    
+    def __init__(self, root: Path = DOCS_DIR, cache_path: Path = KB_INDEX_FILE):
+        self.root = root
+        self.cache_path = cache_path
+        self.dirs: Dict[str, Dict] = {}
+        self._entries: Optional[List[DocEntry]] = None
+    
+    @classmethod
+    def instance(cls) -> "DocIndex":
+        """Shared, refreshed index for this process"""
+        if cls._instance is None:
+            cls._instance = cls()
+            cls._instance.load()
+            cls._instance.refresh()
+        return cls._instance
+    
+    def load(self):
+        """Load cached directory listings from the previous run"""
+        try:
+            data = json.loads(self.cache_path.read_text())
+            if data.get('root') == str(self.root):
+                self.dirs = data['dirs']
+        except (OSError, ValueError, KeyError):
+            self.dirs = {}
+    
+    def refresh(self):
+        """Bring the index up to date, rescanning only changed directories"""
+        dirs = {}
+        changed = False
+        stack = [str(self.root)]
+        while stack:
+            path = stack.pop()
+            try:
+                mtime = os.stat(path).st_mtime_ns
+                listing = self.dirs.get(path)
+                if listing is None or listing['mtime'] != mtime:
+                    listing = self._scan(path, mtime)
+                    changed = True
+            except OSError:
+                continue
+            dirs[path] = listing
+            stack.extend(os.path.join(path, name) for name in listing['subdirs'])
+        
+        if changed or dirs.keys() != self.dirs.keys():
+            self.dirs = dirs
+            try:
+                self.cache_path.write_text(json.dumps({'root': str(self.root), 'dirs': dirs}))
+            except OSError:
+                pass
+        self._entries = None
+    
+    @staticmethod
+    def _scan(path: str, mtime: int) -> Dict:
+        files = {}
+        subdirs = []
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.name)
+                elif entry.name.endswith('.md'):
+                    st = entry.stat()
+                    files[entry.name] = [st.st_size, st.st_mtime]
+        return {'mtime': mtime, 'files': files, 'subdirs': subdirs}
+    
+    def markdown_files(self) -> List[DocEntry]:
+        """All indexed markdown files, sorted by path"""
+        if self._entries is None:
+            root = str(self.root)
+            entries = []
+            for path, listing in self.dirs.items():
+                rel = os.path.relpath(path, root)
+                parts = [] if rel == '.' else rel.split(os.sep)
+                top = parts[0] if parts else None
+                for name, (size, mtime) in listing['files'].items():
+                    entries.append(DocEntry(Path(path, name), size, mtime, top, len(parts)))
+            entries.sort(key=lambda e: e.path)
+            self._entries = entries
+        return self._entries
+
+KB_CACHE_DIR = Path(".kb_cache")
+
+class CategoryCache:
+    """Categorization results keyed by (analyzer, file name, SHA-256 of content)
+    
+    Persisted to .kb_cache/categorizations.json so unchanged files are not
+    re-analyzed on later runs. The file name is part of the key because the
+    analyzers score filename patterns too.
+    """
+    
+    def __init__(self, path: Path = KB_CACHE_DIR / "categorizations.json"):
+        self.path = path
+        self.dirty = False
+        try:
+            self.entries: Dict[str, Dict] = json.loads(path.read_text())
+        except (OSError, ValueError):
+            self.entries = {}
+    
+    def lookup(self, analyzer: str, file_path: Path, result_type: type) -> Tuple[str, Optional[object]]:
+        """Return (key, cached result or None) for file_path"""
+        digest = hashlib.sha256(file_path.read_bytes()).hexdigest()
+        key = f"{analyzer}:{file_path.name}:{digest}"
+        cached = self.entries.get(key)
+        if cached is None:
+            return key, None
+        return key, result_type(file_path=file_path, **cached)
+    
+    def store(self, key: str, result):
+        if result.reason.startswith("Error"):
+            # Don't pin a transient failure to this content hash
+            return
+        fields = asdict(result)
+        del fields['file_path']
+        self.entries[key] = fields
+        self.dirty = True
+    
+    def analyze(self, analyzer: str, file_path: Path, analyze: Callable, result_type: type):
+        """Return the cached result for file_path, running analyze() on a miss"""
+        key, result = self.lookup(analyzer, file_path, result_type)
+        if result is None:
+            result = analyze(file_path)
+            self.store(key, result)
+        return result
+    
+    def save(self):
+        if not self.dirty:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.write_text(json.dumps(self.entries))
+            self.dirty = False
+        except OSError as e:
+            print(f"⚠️ Could not save categorization cache: {e}")
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset("""
+a about an and are as at be by can do does for from has have how i in is it its
+of on or should that the their this to was what when where which who why will
+with you your
+""".split())
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased alphanumeric tokens, minus stopwords and single characters"""
+    return [t for t in TOKEN_RE.findall(text.lower()) if len(t) > 1 and t not in STOPWORDS]
+
+class BM25Index:
+    """Okapi BM25 over the organized knowledge base docs
+    
+    Term frequencies are computed once and persisted to .kb_cache/bm25.json
+    together with the (path, size, mtime) signature of the indexed docs, so
+    queries only touch the postings of their own terms. The index is rebuilt
+    when that signature changes. Each doc is stat'ed afresh for it, since the
+    DocIndex doesn't see files edited in place.
+    """
+    
+    K1 = 1.5
+    B = 0.75
+    
+    def __init__(self, path: Path = KB_CACHE_DIR / "bm25.json"):
+        self.path = path
+        self.signature: List = []
+        self.docs: List[str] = []
+        self.doc_lens: List[int] = []
+        self.postings: Dict[str, List[List[int]]] = {}
+    
+    @classmethod
+    def for_entries(cls, entries: List[DocEntry]) -> "BM25Index":
+        """Load the persisted index, rebuilding it if entries have changed"""
+        index = cls()
+        signature = []
+        for e in entries:
+            try:
+                st = os.stat(e.path)
+                signature.append([str(e.path), st.st_size, st.st_mtime_ns])
+            except OSError:
+                signature.append([str(e.path), None, None])
+        try:
+            data = json.loads(index.path.read_text())
+            if data['signature'] == signature:
+                index.signature = signature
+                index.docs = data['docs']
+                index.doc_lens = data['doc_lens']
+                index.postings = data['postings']
+                return index
+        except (OSError, ValueError, KeyError):
+            pass
+        index.build(entries, signature)
+        return index
+    
+    def build(self, entries: List[DocEntry], signature: List):
+        self.signature = signature
+        self.docs = []
+        self.doc_lens = []
+        self.postings = {}
+        for entry in entries:
+            try:
+                tokens = tokenize(entry.path.read_text(encoding='utf-8', errors='ignore'))
+            except OSError:
+                tokens = []
+            doc_id = len(self.docs)
+            self.docs.append(str(entry.path))
+            self.doc_lens.append(len(tokens))
+            tf: Dict[str, int] = {}
+            for token in tokens:
+                tf[token] = tf.get(token, 0) + 1
+            for token, count in tf.items():
+                self.postings.setdefault(token, []).append([doc_id, count])
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.write_text(json.dumps({
+                'signature': self.signature, 'docs': self.docs,
+                'doc_lens': self.doc_lens, 'postings': self.postings,
+            }))
+        except OSError as e:
+            print(f"⚠️ Could not save search index: {e}")
+    
+    def search(self, question: str, k: int = 5) -> List[Path]:
+        """Top-k docs for the question, best match first"""
+        n = len(self.docs)
+        if not n:
+            return []
+        avgdl = sum(self.doc_lens) / n or 1.0
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(question)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, tf in postings:
+                norm = self.K1 * (1 - self.B + self.B * self.doc_lens[doc_id] / avgdl)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.K1 + 1) / (tf + norm)
+        best = heapq.nlargest(k, scores.items(), key=lambda item: (item[1], -item[0]))
+        return [Path(self.docs[doc_id]) for doc_id, _ in best]
+
+class QueryCache:
+    """LRU cache of generated answers, persisted to .kb_cache/queries.jsonl
+    
+    Lookups first try the exact question hash, then fall back to the cached
+    question whose term vector has the highest cosine similarity, accepting
+    it at SIMILARITY or above. Entries only match when they were answered
+    from the same source documents, so re-organized docs don't serve stale
+    answers.
+    """
+    
+    MAX_ENTRIES = 1000
+    SIMILARITY = 0.95
+    
+    def __init__(self, path: Path = KB_CACHE_DIR / "queries.jsonl"):
+        self.path = path
+        self.entries: "OrderedDict[str, Dict]" = OrderedDict()
+        try:
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    entry = json.loads(line)
+                    self.entries[entry['key']] = entry
+        except (OSError, ValueError, KeyError):
+            self.entries = OrderedDict()
+    
+    @staticmethod
+    def _vector(question: str) -> Dict[str, float]:
+        counts: Dict[str, float] = {}
+        for token in tokenize(question):
+            counts[token] = counts.get(token, 0.0) + 1.0
+        norm = math.sqrt(sum(c * c for c in counts.values())) or 1.0
+        return {t: c / norm for t, c in counts.items()}
+    
+    def get(self, question: str, sources: List[str]) -> Optional[str]:
+        key = hashlib.sha256(question.strip().lower().encode()).hexdigest()
+        entry = self.entries.get(key)
+        if entry is None or entry['sources'] != sources:
+            query = self._vector(question)
+            best, best_score = None, self.SIMILARITY
+            for candidate in self.entries.values():
+                if candidate['sources'] != sources:
+                    continue
+                vector = candidate['vector']
+                score = sum(w * vector.get(t, 0.0) for t, w in query.items())
+                if score >= best_score:
+                    best, best_score = candidate, score
+            entry = best
+        if entry is None:
+            return None
+        self.entries.move_to_end(entry['key'])
+        return entry['answer']
+    
+    def put(self, question: str, sources: List[str], answer: str):
+        key = hashlib.sha256(question.strip().lower().encode()).hexdigest()
+        self.entries[key] = {'key': key, 'sources': sources, 'answer': answer,
+                             'vector': self._vector(question)}
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.MAX_ENTRIES:
+            self.entries.popitem(last=False)
+    
+    def save(self):
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'w', encoding='utf-8') as f:
+                for entry in self.entries.values():
+                    f.write(json.dumps(entry) + "\n")
+        except OSError as e:
+            print(f"⚠️ Could not save query cache: {e}")
+
 class KnowledgeBase:
     """Main knowledge base interface"""
     
@@ -65,36 +425,21 @@ class KnowledgeBase:
             'total_size': 0
         }
         
-        # Count all markdown files
-        all_docs = list(self.docs_dir.rglob("*.md"))
-        stats['total_docs'] = len(all_docs)
-        
-        # Count organized docs in emoji folders
-        organized_docs = []
-        for category, folder in CATEGORY_FOLDERS.items():
-            folder_path = self.docs_dir / folder
-            if folder_path.exists():
-                folder_docs = list(folder_path.glob("*.md"))
-                organized_docs.extend(folder_docs)
-                if folder_docs:
-                    stats['categories'][folder] = len(folder_docs)
-        
-        stats['kb_docs'] = len(organized_docs)
+        # Classify every indexed markdown file by the top-level folder it
+        # lives under: organized (direct children of a category folder),
+        # archived, or unorganized
+        archive_name = self.archive_dir.name
         
-        # Count unorganized docs (not in emoji folders or archive)
-        unorganized = []
-        for doc in all_docs:
-            is_organized = any(doc.is_relative_to(self.docs_dir / folder) 
-                             for folder in CATEGORY_FOLDERS.values() 
-                             if (self.docs_dir / folder).exists())
-            
-            is_archived = (self.archive_dir.exists() and doc.is_relative_to(self.archive_dir))
-            
-            if not is_organized and not is_archived:
-                unorganized.append(doc)
-                stats['total_size'] += doc.stat().st_size
+        for doc in DocIndex.instance().markdown_files():
+            stats['total_docs'] += 1
+            if doc.top in CATEGORY_FOLDER_SET:
+                if doc.depth == 1:
+                    stats['kb_docs'] += 1
+                    stats['categories'][doc.top] = stats['categories'].get(doc.top, 0) + 1
+            elif doc.top != archive_name:
+                stats['unorganized_docs'] += 1
+                stats['total_size'] += doc.size
         
-        stats['unorganized_docs'] = len(unorganized)
         return stats
 
 def cmd_status(args):
@@ -122,25 +467,25 @@ def cmd_analyze(args):
     from migrate_docs import process_files
     import asyncio
     
-    # Find unorganized markdown files
-    kb = KnowledgeBase()
-    all_docs = list(kb.docs_dir.rglob("*.md"))
-    unorganized = []
+    from itertools import islice
     
-    for doc in all_docs:
-        if not (doc.is_relative_to(kb.kb_dir) or 
-               (kb.archive_dir.exists() and doc.is_relative_to(kb.archive_dir))):
-            unorganized.append(doc)
+    # Find unorganized markdown files; paths are streamed into process_files
+    # so categorization starts while the rest are still being selected
+    kb = KnowledgeBase()
+    skip_tops = {kb.kb_dir.name, kb.archive_dir.name}
+    docs = DocIndex.instance().markdown_files()
+    total = sum(1 for doc in docs if doc.top not in skip_tops)
     
-    if not unorganized:
+    if not total:
         print("✅ All documents are already organized!")
         return
     
-    print(f"🔍 Found {len(unorganized)} unorganized documents")
+    print(f"🔍 Found {total} unorganized documents")
     
+    unorganized = (doc.path for doc in docs if doc.top not in skip_tops)
     if args.limit:
-        unorganized = unorganized[:args.limit]
-        print(f"📝 Processing first {len(unorganized)} documents (--limit {args.limit})")
+        unorganized = islice(unorganized, args.limit)
+        print(f"📝 Processing first {min(total, args.limit)} documents (--limit {args.limit})")
     
     # Process files
     asyncio.run(process_files(unorganized, dry_run=args.dry_run, interactive=not args.yes))
@@ -160,9 +505,17 @@ def cmd_categorize(args):
     
     print(f"🏷️  Categorizing {len(markdown_files)} files using rule-based approach")
     
+    # Rule changes must invalidate cached results, so the rules are part of the key
+    rules_digest = hashlib.sha256(json.dumps(categorizer.rules, sort_keys=True).encode()).hexdigest()
+    analyzer = f"rules-{rules_digest[:16]}"
+    cache = CategoryCache()
+    
     categorized = []
     for file_path in markdown_files:
-        doc = categorizer.categorize_file(file_path)
+        try:
+            doc = cache.analyze(analyzer, file_path, categorizer.categorize_file, CategorizedDocument)
+        except OSError:
+            doc = categorizer.categorize_file(file_path)
         categorized.append(doc)
         
         print(f"📄 {file_path.name}")
@@ -178,6 +531,8 @@ def cmd_categorize(args):
     
     for category, docs in sorted(by_category.items()):
         print(f"   {category}: {len(docs)} files")
+    
+    cache.save()
 
 def cmd_query(args):
     """Query the knowledge base with smart Q&A"""
@@ -235,11 +590,23 @@ def query_knowledge_base(question: str) -> str:
         if not relevant_docs:
             return "❌ I couldn't find any relevant documents for your question. Try rephrasing or asking about agents, training, gameplay, or development."
         
+        # Reuse an answer to the same (or a near-identical) question over the same docs
+        sources = [str(doc) for doc in relevant_docs]
+        cache = QueryCache()
+        cached = cache.get(question, sources)
+        if cached is not None:
+            cache.save()
+            return cached
+        
         # Step 2: Extract relevant content
         context = build_context_from_docs(relevant_docs, question)
         
         # Step 3: Generate answer using Qwen3
-        answer = generate_answer_with_qwen(question, context)
+        answer = generate_answer_with_qwen(question, context, relevant_docs)
+        
+        if not answer.startswith("❌"):
+            cache.put(question, sources, answer)
+            cache.save()
         
         return answer
         
@@ -247,58 +614,11 @@ def query_knowledge_base(question: str) -> str:
         return f"❌ Error processing your question: {str(e)}"
 
 def find_relevant_documents(question: str) -> List[Path]:
-    """Find documents relevant to the question using keyword matching"""
-    docs_dir = Path("docs")
-    relevant_docs = []
-    
-    # Normalize question for searching
-    question_lower = question.lower()
-    
-    # Category-based search hints
-    category_keywords = {
-        "agents": ["agent", "ai", "brain", "decision", "sensor", "perception", "behavior"],
-        "training": ["train", "neat", "evolution", "fitness", "learn", "optimize", "tournament"],
-        "gameplay": ["game", "combat", "battle", "physics", "simulation", "team", "fight"],
-        "development": ["setup", "install", "build", "dev", "contribute", "architecture", "performance"],
-        "guides": ["how", "tutorial", "guide", "step", "start", "begin"],
-        "reference": ["api", "spec", "documentation", "interface"]
-    }
-    
-    # Find the most relevant category
-    best_category = None
-    max_matches = 0
-    
-    for category, keywords in category_keywords.items():
-        matches = sum(1 for keyword in keywords if keyword in question_lower)
-        if matches > max_matches:
-            max_matches = matches
-            best_category = category
-    
-    # Search in the relevant category first
-    if best_category:
-        category_folder = CATEGORY_FOLDERS.get(best_category, best_category)
-        category_path = docs_dir / category_folder
-        
-        if category_path.exists():
-            for doc in category_path.glob("*.md"):
-                relevant_docs.append(doc)
-    
-    # If no category match or need more docs, search broadly
-    if len(relevant_docs) < 3:
-        for emoji_folder in CATEGORY_FOLDERS.values():
-            folder_path = docs_dir / emoji_folder
-            if folder_path.exists():
-                for doc in folder_path.glob("*.md"):
-                    if doc not in relevant_docs:
-                        # Quick relevance check
-                        try:
-                            content = doc.read_text(encoding='utf-8', errors='ignore').lower()
-                            if any(word in content for word in question_lower.split() if len(word) > 2):
-                                relevant_docs.append(doc)
-                        except:
-                            continue
-    
-    return relevant_docs[:5]  # Limit to top 5 docs
+    """Find documents relevant to the question, ranked by BM25"""
+    # Organized docs (direct children of each category folder)
+    entries = [e for e in DocIndex.instance().markdown_files()
+               if e.depth == 1 and e.top in CATEGORY_FOLDER_SET]
+    return BM25Index.for_entries(entries).search(question, k=5)
 
 def build_context_from_docs(docs: List[Path], question: str) -> str:
     """Build context string from relevant documents"""
@@ -306,11 +626,14 @@ def build_context_from_docs(docs: List[Path], question: str) -> str:
     
     for doc in docs:
         try:
-            content = doc.read_text(encoding='utf-8', errors='ignore')
+            # Only the head of the file is used; the slack covers multibyte chars
+            with doc.open('rb') as f:
+                raw = f.read(4 * 1001)
+            content = raw.decode('utf-8', errors='ignore').replace('\r\n', '\n').replace('\r', '\n')
             
             # Extract title
             title = doc.stem.replace('_', ' ').title()
-            first_line = content.split('\n')[0]
+            first_line = content.split('\n', 1)[0]
             if first_line.startswith('#'):
                 title = first_line.strip('# ')
             
@@ -326,7 +649,20 @@ def build_context_from_docs(docs: List[Path], question: str) -> str:
     
     return "\n\n".join(context_parts)
 
-def generate_answer_with_qwen(question: str, context: str) -> str:
+_openrouter_session = None
+
+def get_openrouter_session(api_key: str):
+    """Keep-alive session for OpenRouter, so repeated queries reuse the TLS connection"""
+    global _openrouter_session
+    import requests
+    
+    if _openrouter_session is None:
+        _openrouter_session = requests.Session()
+        _openrouter_session.headers["Content-Type"] = "application/json"
+    _openrouter_session.headers["Authorization"] = f"Bearer {api_key}"
+    return _openrouter_session
+
+def generate_answer_with_qwen(question: str, context: str, relevant_docs: List[Path]) -> str:
     """Generate answer using Qwen3 via OpenRouter"""
     import os
     import requests
@@ -352,12 +688,8 @@ Instructions:
 Answer:"""
 
     try:
-        response = requests.post(
+        response = get_openrouter_session(api_key).post(
             "https://openrouter.ai/api/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json"
-            },
             json={
                 "model": "qwen/qwen-2.5-72b-instruct",  # Updated model
                 "messages": [
@@ -375,7 +707,7 @@ Answer:"""
         answer = result['choices'][0]['message']['content'].strip()
         
         # Add source information
-        doc_names = [doc.name for doc in find_relevant_documents(question)]
+        doc_names = [doc.name for doc in relevant_docs]
         if doc_names:
             answer += f"\n\n📚 Sources: {', '.join(doc_names[:3])}"
         
@@ -462,139 +794,123 @@ def cmd_migrate(args):
 
 def cmd_discover(args):
     """Discover all markdown files across the repository"""
-    import subprocess
-    
     print("🔍 Discovering markdown files across the repository...")
     print("=" * 55)
     
-    # Find all markdown files, excluding common non-documentation directories
-    try:
-        result = subprocess.run([
-            'find', '.', '-name', '*.md', '-type', 'f'
-        ], capture_output=True, text=True, check=True)
-        
-        all_files = result.stdout.strip().split('\n')
-        
-        # Filter out unwanted directories
-        excluded_patterns = [
-            'node_modules', '.venv', 'venv', '.git', 
-            '__pycache__', '.cargo/registry', 'target/debug', 'target/release'
-        ]
-        
-        filtered_files = []
-        for file_path in all_files:
-            if file_path and not any(pattern in file_path for pattern in excluded_patterns):
-                filtered_files.append(Path(file_path))
-        
-        print(f"📊 Found {len(filtered_files)} markdown files total")
-        
-        # Categorize by location
-        categories = {
-            'organized': [],      # Already in our emoji folders
-            'docs_root': [],      # In docs/ but not organized
-            'sim_core': [],       # In sim_core/
-            'root': [],          # In project root
-            'other': []          # Elsewhere
-        }
-        
-        for file_path in filtered_files:
-            path_str = str(file_path)
-            if any(emoji in path_str for emoji in ['🤖', '🧠', '🎮', '🔧', '📖', '📚']):
+    # Find all markdown files, pruning common non-documentation directories
+    filtered_files = list(walk_markdown('.'))
+    print(f"📊 Found {len(filtered_files)} markdown files total")
+    
+    # Categorize by location
+    categories = {
+        'organized': [],      # Already in our emoji folders
+        'docs_root': [],      # In docs/ but not organized
+        'sim_core': [],       # In sim_core/
+        'root': [],          # In project root
+        'other': []          # Elsewhere
+    }
+    
+    # Classify by leading path components: one split and a set lookup per file
+    for file_path in filtered_files:
+        parts = file_path.as_posix().split('/', 2)
+        if len(parts) == 1:  # Root level files
+            categories['root'].append(file_path)
+        elif parts[0] == 'docs':
+            if len(parts) == 3 and parts[1] in CATEGORY_FOLDER_SET:
                 categories['organized'].append(file_path)
-            elif path_str.startswith('./docs/') and not path_str.startswith('./docs/knowledge/'):
+            elif parts[1] != 'knowledge':
                 categories['docs_root'].append(file_path)
-            elif path_str.startswith('./sim_core/'):
-                categories['sim_core'].append(file_path)
-            elif path_str.count('/') == 1:  # Root level files
-                categories['root'].append(file_path)
             else:
                 categories['other'].append(file_path)
-        
-        # Display results
-        print(f"\n📁 File Distribution:")
-        print(f"   ✅ Already organized: {len(categories['organized'])} files")
-        print(f"   📄 docs/ (unorganized): {len(categories['docs_root'])} files")
-        print(f"   🦀 sim_core/: {len(categories['sim_core'])} files")
-        print(f"   📋 root level: {len(categories['root'])} files")
-        print(f"   📂 other locations: {len(categories['other'])} files")
-        
-        # Show unorganized files by location
-        if args.show_files:
-            for category, files in categories.items():
-                if category != 'organized' and files:
-                    print(f"\n📂 {category.replace('_', ' ').title()} files:")
-                    for file_path in sorted(files)[:10]:  # Show first 10
-                        print(f"   • {file_path}")
-                    if len(files) > 10:
-                        print(f"   ... and {len(files) - 10} more")
-        
-        # Show actionable suggestions
-        unorganized_count = sum(len(files) for cat, files in categories.items() if cat != 'organized')
-        if unorganized_count > 0:
-            print(f"\n💡 Next steps:")
-            print(f"   • Run 'kb harvest' to analyze and organize {unorganized_count} unorganized files")
-            print(f"   • Use 'kb harvest --dry-run' to preview the organization")
-            print(f"   • Add '--show-files' to see detailed file lists")
-        
-        return categories
-        
-    except subprocess.CalledProcessError as e:
-        print(f"❌ Error finding files: {e}")
-        return None
+        elif parts[0] == 'sim_core':
+            categories['sim_core'].append(file_path)
+        else:
+            categories['other'].append(file_path)
+    
+    # Display results
+    print(f"\n📁 File Distribution:")
+    print(f"   ✅ Already organized: {len(categories['organized'])} files")
+    print(f"   📄 docs/ (unorganized): {len(categories['docs_root'])} files")
+    print(f"   🦀 sim_core/: {len(categories['sim_core'])} files")
+    print(f"   📋 root level: {len(categories['root'])} files")
+    print(f"   📂 other locations: {len(categories['other'])} files")
+    
+    # Show unorganized files by location
+    if args.show_files:
+        for category, files in categories.items():
+            if category != 'organized' and files:
+                print(f"\n📂 {category.replace('_', ' ').title()} files:")
+                for file_path in sorted(files)[:10]:  # Show first 10
+                    print(f"   • {file_path}")
+                if len(files) > 10:
+                    print(f"   ... and {len(files) - 10} more")
+    
+    # Show actionable suggestions
+    unorganized_count = sum(len(files) for cat, files in categories.items() if cat != 'organized')
+    if unorganized_count > 0:
+        print(f"\n💡 Next steps:")
+        print(f"   • Run 'kb harvest' to analyze and organize {unorganized_count} unorganized files")
+        print(f"   • Use 'kb harvest --dry-run' to preview the organization")
+        print(f"   • Add '--show-files' to see detailed file lists")
+    
+    return categories
+
+def copy_doc(src: Path, dst: Path):
+    """Copy file contents in-kernel with copy_file_range where available
+    
+    Metadata is not copied; falls back to shutil.copyfile (sendfile on
+    Linux) when copy_file_range is missing or refused by the filesystem.
+    """
+    import shutil
+    
+    if hasattr(os, 'copy_file_range'):
+        try:
+            with open(src, 'rb') as s, open(dst, 'wb') as d:
+                remaining = os.fstat(s.fileno()).st_size
+                while remaining > 0:
+                    copied = os.copy_file_range(s.fileno(), d.fileno(), remaining)
+                    if copied == 0:
+                        break
+                    remaining -= copied
+                else:
+                    return
+        except OSError:
+            pass
+    shutil.copyfile(src, dst)
 
 def cmd_harvest(args):
     """Harvest and organize markdown files from across the repository"""
-    import shutil
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
     
     print("🌾 Harvesting documentation from across the repository...")
     print("=" * 60)
     
-    # Find all markdown files manually to exclude archives
-    import subprocess
-    try:
-        result = subprocess.run([
-            'find', '.', '-name', '*.md', '-type', 'f'
-        ], capture_output=True, text=True, check=True)
-        
-        all_files = result.stdout.strip().split('\n')
-        
-        # Filter out unwanted directories and files
-        excluded_patterns = [
-            'node_modules', '.venv', 'venv', '.git', 
-            '__pycache__', '.cargo/registry', 'target/debug', 'target/release',
-            'docs/archive'  # Exclude archive by default
-        ]
-        
-        if not args.include_archive:
-            excluded_patterns.append('docs/archive')
-        
-        # Also exclude already organized files
-        emoji_patterns = ['🤖', '🧠', '🎮', '🔧', '📖', '📚']
-        
-        harvestable = []
-        for file_path_str in all_files:
-            if not file_path_str:
-                continue
-                
-            # Skip excluded patterns
-            if any(pattern in file_path_str for pattern in excluded_patterns):
+    # Find all markdown files, pruning excluded directories during the walk
+    # Already organized files are skipped by pruning their category folders
+    exclude_subpaths = EXCLUDED_SUBPATHS + tuple(f"docs/{folder}" for folder in CATEGORY_FOLDER_SET)
+    if not args.include_archive:
+        exclude_subpaths += ('docs/archive',)
+    
+    harvestable = []
+    small_files = set()
+    for entry in walk_markdown_entries('.', exclude_subpaths=exclude_subpaths):
+        # Skip certain metadata files
+        filename = entry.name.lower()
+        if any(skip in filename for skip in ['readme', 'license', 'privacy', 'changelog']):
+            if not args.include_meta:
                 continue
-                
-            # Skip already organized files
-            if any(emoji in file_path_str for emoji in emoji_patterns):
-                continue
-                
-            # Skip certain metadata files
-            filename = Path(file_path_str).name.lower()
-            if any(skip in filename for skip in ['readme', 'license', 'privacy', 'changelog']):
-                if not args.include_meta:
-                    continue
-            
-            harvestable.append(Path(file_path_str))
         
-    except subprocess.CalledProcessError as e:
-        print(f"❌ Error finding files: {e}")
-        return
+        file_path = Path(entry.path)
+        harvestable.append(file_path)
+        
+        # Very small files are likely not documentation; the scandir entry
+        # caches its stat, so nothing is stat'ed again later
+        try:
+            if entry.stat().st_size < 50:
+                small_files.add(file_path)
+        except OSError as e:
+            print(f"❌ Error processing {file_path}: {e}")
+            small_files.add(file_path)
     
     if not harvestable:
         print("✅ All relevant files are already organized!")
@@ -605,16 +921,44 @@ def cmd_harvest(args):
     # Categorize files using the improved system
     organized_count = 0
     skipped_count = 0
+    cache = CategoryCache()
     
+    # Categorize the files using the improved analysis: cached results first,
+    # then the misses in parallel since analysis is CPU-bound Python
+    analyses: Dict[Path, DocumentAnalysis] = {}
+    misses: List[Tuple[Path, str]] = []
     for file_path in harvestable:
+        if file_path in small_files:
+            continue
         try:
-            # Skip very small files (likely not documentation)
-            if file_path.stat().st_size < 50:
+            key, doc = cache.lookup("analyze_file", file_path, DocumentAnalysis)
+        except OSError as e:
+            print(f"❌ Error processing {file_path}: {e}")
+            continue
+        if doc is None:
+            misses.append((file_path, key))
+        else:
+            analyses[file_path] = doc
+    
+    if misses:
+        with ProcessPoolExecutor() as executor:
+            docs = executor.map(analyze_file, [path for path, _ in misses], chunksize=32)
+            for (file_path, key), doc in zip(misses, docs):
+                cache.store(key, doc)
+                analyses[file_path] = doc
+    
+    # Copies are queued on a thread pool so their reads and writes overlap;
+    # targets are claimed up front so queued copies can't collide
+    copier = ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4))
+    copies = []
+    claimed = set()
+    
+    for file_path in harvestable:
+        try:
+            doc = analyses.get(file_path)
+            if doc is None:
                 skipped_count += 1
                 continue
-                
-            # Categorize the file using the improved analysis
-            doc = analyze_file(file_path)
             
             # Get target location
             target_folder = get_target_folder(doc.category)
@@ -624,7 +968,7 @@ def cmd_harvest(args):
             # Handle name conflicts
             counter = 1
             original_target = target_path
-            while target_path.exists():
+            while target_path in claimed or target_path.exists():
                 stem = original_target.stem
                 suffix = original_target.suffix
                 target_path = original_target.parent / f"{stem}_{counter}{suffix}"
@@ -643,9 +987,9 @@ def cmd_harvest(args):
                 target_dir.mkdir(parents=True, exist_ok=True)
                 
                 # Copy (don't move) to preserve original structure
-                shutil.copy2(str(file_path), str(target_path))
-                organized_count += 1
-                print("   ✅ Copied to knowledge base!")
+                claimed.add(target_path)
+                copies.append((file_path, copier.submit(copy_doc, file_path, target_path)))
+                print("   ✅ Copying to knowledge base!")
             
             print()
             
@@ -654,6 +998,17 @@ def cmd_harvest(args):
             skipped_count += 1
             continue
     
+    copier.shutdown(wait=True)
+    for file_path, copy in copies:
+        error = copy.exception()
+        if error is not None:
+            print(f"❌ Error copying {file_path}: {error}")
+            skipped_count += 1
+        else:
+            organized_count += 1
+    
+    cache.save()
+    
     # Summary
     if args.dry_run:
         print(f"🔍 Dry run complete:")
@@ -665,51 +1020,87 @@ def cmd_harvest(args):
         print(f"   • Skipped: {skipped_count} files")
         print(f"\n📚 Run 'kb status' to see the updated knowledge base")
 
+# Name fragments typical of auto-generated or copied files
+SUSPICIOUS_NAME_RE = re.compile(r"untitled|copy|duplicate|\(1\)|_1|_2", re.IGNORECASE)
+
+def hash_file(file_path: Path, chunk_size: int = 1 << 20) -> str:
+    """64-bit BLAKE2b digest of a file's raw bytes, read in reusable chunks"""
+    h = hashlib.blake2b(digest_size=8)
+    buf = bytearray(chunk_size)
+    view = memoryview(buf)
+    with open(file_path, 'rb', buffering=0) as f:
+        n = f.readinto(buf)
+        while n:
+            h.update(view[:n])
+            n = f.readinto(buf)
+    return h.hexdigest()
+
 def cmd_cleanup(args):
     """Clean up duplicate and redundant files in the knowledge base"""
-    import hashlib
-    from collections import defaultdict
+    from concurrent.futures import ThreadPoolExecutor
     
     print("🧹 Cleaning up knowledge base duplicates and redundancy...")
     print("=" * 55)
     
-    # Find all files in organized folders
+    # Find all files in organized folders, capturing sizes from the scan itself
     kb_files = []
-    for category, folder in CATEGORY_FOLDERS.items():
-        folder_path = Path("docs") / folder
-        if folder_path.exists():
-            for file_path in folder_path.glob("*.md"):
-                kb_files.append(file_path)
+    for folder_path in CATEGORY_FOLDER_PATHS:
+        try:
+            with os.scandir(folder_path) as it:
+                for entry in it:
+                    if entry.name.endswith('.md') and entry.is_file():
+                        kb_files.append((folder_path / entry.name, entry.stat().st_size))
+        except OSError:
+            continue
     
     print(f"📊 Found {len(kb_files)} files in knowledge base")
     
-    # Group files by content hash to find duplicates
-    file_hashes = defaultdict(list)
-    file_sizes = defaultdict(list)
+    # Group files by content hash (and size) to find duplicates. Keys seen only
+    # once stay in `seen_*`; only keys seen again get a group, so memory
+    # scales with the duplicates rather than with the whole KB.
+    seen_hashes: Dict[str, Path] = {}
+    seen_sizes: Dict[int, Path] = {}
+    duplicates: Dict[str, List[Path]] = {}
+    size_duplicates: Dict[int, List[Path]] = {}
     suspicious_names = []
     
-    for file_path in kb_files:
+    def group_repeat(seen, groups, key, file_path):
+        if key in groups:
+            groups[key].append(file_path)
+        elif key in seen:
+            groups[key] = [seen.pop(key), file_path]
+        else:
+            seen[key] = file_path
+    
+    def hash_one(item):
+        file_path, size = item
         try:
-            content = file_path.read_text(encoding='utf-8', errors='ignore')
-            content_hash = hashlib.md5(content.encode()).hexdigest()
-            file_hashes[content_hash].append(file_path)
-            
-            size = file_path.stat().st_size
-            file_sizes[size].append(file_path)
-            
-            # Flag suspicious file names
-            name = file_path.name.lower()
-            if any(pattern in name for pattern in ['untitled', 'copy', 'duplicate', '(1)', '_1', '_2']):
+            return file_path, size, hash_file(file_path), None
+        except Exception as e:
+            return file_path, size, None, e
+    
+    # Reads and hashing release the GIL, so overlapping them across threads pays off
+    with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4)) as executor:
+        hashed = executor.map(hash_one, kb_files, chunksize=16)
+        
+        # Flag suspicious file names while the hashes are computed
+        for file_path, _ in kb_files:
+            name = file_path.name
+            if SUSPICIOUS_NAME_RE.search(name):
                 # Exclude index_* files - they have their own rename command
-                if not name.startswith('index_'):
+                if not name.lower().startswith('index_'):
                     suspicious_names.append(file_path)
-                
-        except Exception as e:
-            print(f"⚠️ Error reading {file_path}: {e}")
+        
+        for file_path, size, content_hash, error in hashed:
+            if error is not None:
+                print(f"⚠️ Error reading {file_path}: {error}")
+                continue
+            group_repeat(seen_hashes, duplicates, content_hash, file_path)
+            group_repeat(seen_sizes, size_duplicates, size, file_path)
+    del seen_hashes, seen_sizes
     
     # Report findings
-    duplicates = {h: files for h, files in file_hashes.items() if len(files) > 1}
-    size_duplicates = {s: files for s, files in file_sizes.items() if len(files) > 1}
+    dup_paths = {f for files in duplicates.values() for f in files[1:]}
     
     print(f"\n🔍 Analysis Results:")
     print(f"   📄 Total files: {len(kb_files)}")
@@ -761,7 +1152,7 @@ def cmd_cleanup(args):
     if args.remove_suspicious or args.remove_all:
         print(f"\n🗑️ Removing suspicious files...")
         for file_path in suspicious_names:
-            if file_path not in [f for files in duplicates.values() for f in files[1:]]:  # Don't double-remove
+            if file_path not in dup_paths:  # Don't double-remove
                 if args.dry_run:
                     print(f"   🔍 Would remove: {file_path}")
                 else:
@@ -798,71 +1189,118 @@ def cmd_archive_status(args):
     
     print(f"\n💡 To include archive in harvest: kb harvest --include-archive")
 
+# Title extraction and filename cleanup for rename-index-files
+TITLE_RE = re.compile(r'^#\s+(.+?)$', re.MULTILINE)
+NON_FILENAME_RE = re.compile(r'[^\w\s-]')
+WHITESPACE_RE = re.compile(r'\s+')
+NON_WORD_RE = re.compile(r'[^\w]')
+
+def propose_index_name(file_path: Path) -> Tuple[str, str]:
+    """Derive a descriptive filename and a content preview for an index_* file"""
+    # Read just the head to extract the title; the whole file is only
+    # needed when the head has none
+    with open(file_path, 'rb') as f:
+        head_bytes = f.read(4096)
+    truncated = len(head_bytes) == 4096
+    # Newlines normalised as read_text() does, so CRLF files leak no '\r'
+    content = head_bytes.decode('utf-8', errors='ignore').replace('\r\n', '\n').replace('\r', '\n')
+    
+    # Try to extract a good name from the content
+    new_name = None
+    
+    # Method 1: Look for # Title at the start (only complete lines of a truncated head)
+    title_match = TITLE_RE.search(content[:content.rfind('\n') + 1] if truncated else content)
+    if not title_match and truncated:
+        content = file_path.read_text(encoding='utf-8', errors='ignore')
+        title_match = TITLE_RE.search(content)
+    if title_match:
+        title = title_match.group(1).strip()
+        # Clean up the title for filename
+        new_name = NON_FILENAME_RE.sub('', title).strip()
+        new_name = WHITESPACE_RE.sub('_', new_name)
+        new_name = new_name[:50]  # Limit length
+    
+    # Method 2: If no title, try to guess from content keywords
+    if not new_name:
+        content_lower = content.lower()
+        if 'neat' in content_lower and 'training' in content_lower:
+            new_name = "neat_training_guide"
+        elif 'agent' in content_lower and 'sensor' in content_lower:
+            new_name = "agent_sensor_guide"
+        elif 'gameplay' in content_lower and 'simulation' in content_lower:
+            new_name = "gameplay_simulation_guide"
+        elif 'development' in content_lower and 'setup' in content_lower:
+            new_name = "development_setup_guide"
+        else:
+            # Use first few words of content
+            words = content.split()[:5]
+            new_name = "_".join(NON_WORD_RE.sub('', word) for word in words if word.isalpha())
+            new_name = new_name[:30]
+    
+    # Fallback: keep as index_X but make it clear it needs manual review
+    if not new_name or len(new_name) < 3:
+        new_name = f"document_{file_path.stem}"
+    
+    # Ensure .md extension
+    if not new_name.endswith('.md'):
+        new_name += '.md'
+    
+    # Show preview of content for verification
+    preview = content[:100].replace('\n', ' ').strip()
+    if len(content) > 100:
+        preview += "..."
+    return new_name, preview
+
 def cmd_rename_index_files(args):
     """Intelligently rename index_* files to proper names"""
+    from concurrent.futures import ThreadPoolExecutor
+    
     print("🔧 Renaming index_* files to proper names...")
     print("=" * 45)
     
-    # Find all index_* files in organized folders
+    # Find all index_* files in organized folders, remembering every name in
+    # each folder so conflicts are resolved without stat'ing candidates
     index_files = []
-    for category, folder in CATEGORY_FOLDERS.items():
-        folder_path = Path("docs") / folder
-        if folder_path.exists():
-            for file_path in folder_path.glob("index_*.md"):
-                index_files.append(file_path)
+    used_names: Dict[Path, set] = {}
+    for folder_path in CATEGORY_FOLDER_PATHS:
+        try:
+            with os.scandir(folder_path) as it:
+                names = used_names[folder_path] = set()
+                for entry in it:
+                    names.add(entry.name)
+                    if entry.name.startswith('index_') and entry.name.endswith('.md') and entry.is_file():
+                        index_files.append(folder_path / entry.name)
+        except OSError:
+            continue
     
     print(f"📊 Found {len(index_files)} index_* files to rename")
     
+    # Reading and naming are independent per file, so they run on a thread
+    # pool; conflict handling and renames stay serial
+    def propose(file_path):
+        try:
+            return propose_index_name(file_path), None
+        except Exception as e:
+            return None, e
+    
+    with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4)) as executor:
+        proposals = list(executor.map(propose, index_files))
+    
     renamed_count = 0
-    for file_path in index_files:
+    for file_path, (proposal, error) in zip(index_files, proposals):
         try:
-            # Read content to extract title
-            content = file_path.read_text(encoding='utf-8', errors='ignore')
-            
-            # Try to extract a good name from the content
-            new_name = None
-            
-            # Method 1: Look for # Title at the start
-            title_match = re.search(r'^#\s+(.+?)$', content, re.MULTILINE)
-            if title_match:
-                title = title_match.group(1).strip()
-                # Clean up the title for filename
-                new_name = re.sub(r'[^\w\s-]', '', title).strip()
-                new_name = re.sub(r'\s+', '_', new_name)
-                new_name = new_name[:50]  # Limit length
-            
-            # Method 2: If no title, try to guess from content keywords
-            if not new_name:
-                content_lower = content.lower()
-                if 'neat' in content_lower and 'training' in content_lower:
-                    new_name = "neat_training_guide"
-                elif 'agent' in content_lower and 'sensor' in content_lower:
-                    new_name = "agent_sensor_guide"
-                elif 'gameplay' in content_lower and 'simulation' in content_lower:
-                    new_name = "gameplay_simulation_guide"
-                elif 'development' in content_lower and 'setup' in content_lower:
-                    new_name = "development_setup_guide"
-                else:
-                    # Use first few words of content
-                    words = content.split()[:5]
-                    new_name = "_".join(re.sub(r'[^\w]', '', word) for word in words if word.isalpha())
-                    new_name = new_name[:30]
-            
-            # Fallback: keep as index_X but make it clear it needs manual review
-            if not new_name or len(new_name) < 3:
-                new_name = f"document_{file_path.stem}"
-            
-            # Ensure .md extension
-            if not new_name.endswith('.md'):
-                new_name += '.md'
+            if error is not None:
+                raise error
+            new_name, preview = proposal
             
             # Create new path
             new_path = file_path.parent / new_name
             
             # Handle conflicts
+            names = used_names[file_path.parent]
             counter = 1
             original_new_path = new_path
-            while new_path.exists() and new_path != file_path:
+            while new_path.name in names and new_path != file_path:
                 stem = original_new_path.stem
                 suffix = original_new_path.suffix
                 new_path = original_new_path.parent / f"{stem}_{counter}{suffix}"
@@ -870,20 +1308,19 @@ def cmd_rename_index_files(args):
             
             print(f"📄 {file_path.name}")
             print(f"   → {new_path.name}")
-            
-            # Show preview of content for verification
-            preview = content[:100].replace('\n', ' ').strip()
-            if len(content) > 100:
-                preview += "..."
             print(f"   Preview: {preview}")
             
             if args.dry_run:
                 print("   🔍 Would rename (dry-run)")
             else:
-                file_path.rename(new_path)
+                os.rename(file_path, new_path)
                 print("   ✅ Renamed!")
                 renamed_count += 1
             
+            # Track the rename (or the planned one) for later conflict checks
+            names.discard(file_path.name)
+            names.add(new_path.name)
+            
             print()
             
         except Exception as e:
@@ -895,10 +1332,29 @@ def cmd_rename_index_files(args):
         print(f"✅ Rename complete! Renamed {renamed_count} files")
         print(f"📚 Run 'kb status' to see the updated knowledge base")
 
+def remove_tree(path: Path) -> int:
+    """Remove a directory tree bottom-up, returning how many entries it held"""
+    # os.walk would follow a symlinked top and empty the directory it points
+    # to; refuse it, as shutil.rmtree does
+    if os.path.islink(path):
+        raise OSError(f"Cannot remove a symbolic link as a tree: {path}")
+    count = 0
+    for root, dirs, files in os.walk(path, topdown=False):
+        for name in files:
+            os.unlink(os.path.join(root, name))
+        for name in dirs:
+            dir_path = os.path.join(root, name)
+            # Symlinked directories are listed but not descended into
+            if os.path.islink(dir_path):
+                os.unlink(dir_path)
+            else:
+                os.rmdir(dir_path)
+        count += len(dirs) + len(files)
+    os.rmdir(path)
+    return count
+
 def cmd_cleanup_old_structure(args):
     """Clean up the old knowledge/documents structure after successful harvest"""
-    import shutil
-    
     print("🧹 Cleaning up old knowledge base structure...")
     print("=" * 50)
     
@@ -916,14 +1372,15 @@ def cmd_cleanup_old_structure(args):
         
         if target_path.exists():
             if target_path.is_dir():
-                # Count files in directory
-                file_count = len(list(target_path.rglob("*")))
-                print(f"📂 {target}: {file_count} items")
-                
                 if args.dry_run:
+                    # Count files in directory
+                    file_count = sum(len(dirs) + len(files) for _, dirs, files in os.walk(target_path))
+                    print(f"📂 {target}: {file_count} items")
                     print(f"   🔍 Would remove directory (dry-run)")
                 else:
-                    shutil.rmtree(target_path)
+                    # Counted while removing, so the tree is only walked once
+                    file_count = remove_tree(target_path)
+                    print(f"📂 {target}: {file_count} items")
                     print(f"   ✅ Removed directory!")
                     removed_count += file_count
             else:
@@ -946,28 +1403,12 @@ def cmd_cleanup_old_structure(args):
         print(f"📚 Old knowledge structure has been cleaned up")
         print(f"💡 Run 'kb status' to see the clean knowledge base")
 
-def main():
-    parser = argparse.ArgumentParser(
-        description="🧠 Knowledge Base CLI - Unified interface for document management",
-        formatter_class=argparse.RawDescriptionHelpFormatter,
-        epilog="""
-Examples:
-  kb status                    # Show knowledge base overview
-  kb analyze                   # Analyze unorganized docs with LLM  
-  kb analyze --dry-run         # Preview what would be analyzed
-  kb analyze --limit 5         # Process only first 5 docs
-  kb categorize docs/          # Rule-based categorization
-  kb query "NEAT training"     # Search knowledge base (coming soon)
-  kb benchmark                 # Performance testing (coming soon)
-        """
-    )
-    
-    subparsers = parser.add_subparsers(dest='command', help='Available commands')
-    
-    # Status command
-    status_parser = subparsers.add_parser('status', help='Show knowledge base status')
-    
-    # Analyze command (LLM-powered)
+def _build_status(subparsers):
+    """Status command"""
+    subparsers.add_parser('status', help='Show knowledge base status')
+
+def _build_analyze(subparsers):
+    """Analyze command (LLM-powered)"""
     analyze_parser = subparsers.add_parser('analyze', help='Analyze documents with LLM')
     analyze_parser.add_argument('--dry-run', action='store_true', 
                                help='Show what would be done without making changes')
@@ -975,33 +1416,39 @@ Examples:
                                help='Skip interactive prompts')
     analyze_parser.add_argument('--limit', type=int,
                                help='Limit number of documents to process')
-    
-    # Categorize command (rule-based)
+
+def _build_categorize(subparsers):
+    """Categorize command (rule-based)"""
     categorize_parser = subparsers.add_parser('categorize', help='Rule-based categorization')
     categorize_parser.add_argument('source', nargs='?', default='docs',
                                   help='Source directory (default: docs)')
     categorize_parser.add_argument('--dry-run', action='store_true',
                                   help='Show categorization without moving files')
-    
-    # Query command (future)
+
+def _build_query(subparsers):
+    """Query command (future)"""
     query_parser = subparsers.add_parser('query', help='Query the knowledge base')
     query_parser.add_argument('question', nargs='?',
                              help='Question to ask the knowledge base')
-    
-    # Benchmark command (future)
-    benchmark_parser = subparsers.add_parser('benchmark', help='Benchmark performance')
-    
-    # Migrate command
+
+def _build_benchmark(subparsers):
+    """Benchmark command (future)"""
+    subparsers.add_parser('benchmark', help='Benchmark performance')
+
+def _build_migrate(subparsers):
+    """Migrate command"""
     migrate_parser = subparsers.add_parser('migrate', help='Migrate files to the new structure')
     migrate_parser.add_argument('--dry-run', action='store_true',
                                help='Show what would be done without making changes')
-    
-    # Discover command
+
+def _build_discover(subparsers):
+    """Discover command"""
     discover_parser = subparsers.add_parser('discover', help='Discover markdown files across the repository')
     discover_parser.add_argument('--show-files', action='store_true',
                                  help='Show unorganized files by location')
-    
-    # Harvest command
+
+def _build_harvest(subparsers):
+    """Harvest command"""
     harvest_parser = subparsers.add_parser('harvest', help='Harvest and organize markdown files from across the repository')
     harvest_parser.add_argument('--dry-run', action='store_true',
                                 help='Show what would be done without making changes')
@@ -1009,8 +1456,9 @@ Examples:
                                 help='Include metadata in harvested files')
     harvest_parser.add_argument('--include-archive', action='store_true',
                                 help='Include archive files in harvested files')
-    
-    # Cleanup command
+
+def _build_cleanup(subparsers):
+    """Cleanup command"""
     cleanup_parser = subparsers.add_parser('cleanup', help='Clean up duplicate and redundant files in the knowledge base')
     cleanup_parser.add_argument('--dry-run', action='store_true',
                                 help='Show what would be done without making changes')
@@ -1020,21 +1468,67 @@ Examples:
                                 help='Remove suspicious files')
     cleanup_parser.add_argument('--remove-all', action='store_true',
                                 help='Remove both exact duplicates and suspicious files')
-    
-    # Archive status command
+
+def _build_archive_status(subparsers):
+    """Archive status command"""
     archive_status_parser = subparsers.add_parser('archive-status', help='Show status of archived documents')
     archive_status_parser.add_argument('--show-files', action='store_true',
                                         help='Show archived files')
-    
-    # Rename index files command
+
+def _build_rename_index_files(subparsers):
+    """Rename index files command"""
     rename_index_files_parser = subparsers.add_parser('rename-index-files', help='Rename index_* files to proper names')
     rename_index_files_parser.add_argument('--dry-run', action='store_true',
                                            help='Show what would be done without making changes')
-    
-    # Cleanup old structure command
+
+def _build_cleanup_old_structure(subparsers):
+    """Cleanup old structure command"""
     cleanup_old_structure_parser = subparsers.add_parser('cleanup-old-structure', help='Clean up the old knowledge/documents structure after successful harvest')
     cleanup_old_structure_parser.add_argument('--dry-run', action='store_true',
                                                help='Show what would be done without making changes')
+
+# Subcommand name -> function adding its parser, so main() only builds what it needs
+SUBPARSER_BUILDERS = {
+    'status': _build_status,
+    'analyze': _build_analyze,
+    'categorize': _build_categorize,
+    'query': _build_query,
+    'benchmark': _build_benchmark,
+    'migrate': _build_migrate,
+    'discover': _build_discover,
+    'harvest': _build_harvest,
+    'cleanup': _build_cleanup,
+    'archive-status': _build_archive_status,
+    'rename-index-files': _build_rename_index_files,
+    'cleanup-old-structure': _build_cleanup_old_structure,
+}
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="🧠 Knowledge Base CLI - Unified interface for document management",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  kb status                    # Show knowledge base overview
+  kb analyze                   # Analyze unorganized docs with LLM  
+  kb analyze --dry-run         # Preview what would be analyzed
+  kb analyze --limit 5         # Process only first 5 docs
+  kb categorize docs/          # Rule-based categorization
+  kb query "NEAT training"     # Search knowledge base (coming soon)
+  kb benchmark                 # Performance testing (coming soon)
+        """
+    )
+    
+    subparsers = parser.add_subparsers(dest='command', help='Available commands')
+    
+    # Only the invoked subcommand's parser is built; help, a missing or an
+    # unknown command need all of them
+    command = next((arg for arg in sys.argv[1:] if not arg.startswith('-')), None)
+    if command in SUBPARSER_BUILDERS and not {'-h', '--help'} & set(sys.argv[1:]):
+        SUBPARSER_BUILDERS[command](subparsers)
+    else:
+        for build in SUBPARSER_BUILDERS.values():
+            build(subparsers)
     
     args = parser.parse_args()
     
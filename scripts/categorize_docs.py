@@ -4,11 +4,16 @@ Rule-based document categorization module.
 """
 
 import json
+import re
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, TextIO, Tuple
 from dataclasses import dataclass
 
-@dataclass
+TITLE_RE = re.compile(r'^#\s+(.+?)$', re.MULTILINE)
+# Documents are lowercased for keyword matching this many characters at a time
+SCAN_CHUNK = 64 * 1024
+
+@dataclass(frozen=True)
 class DocumentAnalysis:
     """Analysis result for a document"""
     file_path: Path
@@ -17,6 +22,15 @@ class DocumentAnalysis:
     reason: str
     title: Optional[str] = None
 
+class CategoryRules(NamedTuple):
+    """One category's rules, lowercased and ready for scoring"""
+    category: str
+    keywords: Tuple[str, ...]
+    keyword_count: int
+    filename_patterns: Tuple[str, ...]
+    filename_pattern_count: int
+    weight: float
+
 class DocumentCategorizer:
     """Rule-based document categorizer"""
     
@@ -24,6 +38,11 @@ class DocumentCategorizer:
         """Initialize with rules from JSON file"""
         self.rules_file = Path(rules_file)
         self.rules = self._load_rules()
+        self._compiled_rules = self._compile_rules()
+        # Every content keyword across all categories, each searched for once per document
+        self._keywords = frozenset(
+            keyword for rules in self._compiled_rules for keyword in rules.keywords
+        )
     
     def _load_rules(self) -> Dict:
         """Load categorization rules from JSON file"""
@@ -70,11 +89,26 @@ class DocumentCategorizer:
             }
         }
     
+    def _compile_rules(self) -> List[CategoryRules]:
+        """Flatten the rules into per-category tuples for the scoring loop
+        
+        Accepts both the built-in keys (keywords/filename_patterns) and the ones
+        used by scripts/doc_rules.json (patterns/files).
+        """
+        compiled = []
+        for category, rules in self.rules.get("categories", {}).items():
+            keywords = tuple(k.lower() for k in rules.get("keywords", rules.get("patterns", ())))
+            patterns = tuple(p.lower() for p in rules.get("filename_patterns", rules.get("files", ())))
+            compiled.append(CategoryRules(
+                category, keywords, len(keywords) or 1, patterns, len(patterns) or 1, rules.get("weight", 1.0)
+            ))
+        return compiled
+    
     def categorize_file(self, file_path: Path) -> DocumentAnalysis:
         """Categorize a single file"""
         try:
-            content = file_path.read_text(encoding='utf-8', errors='ignore')
-            return self._categorize_content(file_path, content)
+            with file_path.open('r', encoding='utf-8', errors='ignore') as f:
+                return self._categorize_stream(file_path, f)
         except Exception as e:
             return DocumentAnalysis(
                 file_path=file_path,
@@ -85,36 +119,86 @@ class DocumentCategorizer:
     
     def _categorize_content(self, file_path: Path, content: str) -> DocumentAnalysis:
         """Categorize based on content and filename"""
-        content_lower = content.lower()
-        filename_lower = file_path.name.lower()
+        # Categories are scored against the set of keywords the document contains
+        content_hits = self._keyword_hits(
+            content[start:start + SCAN_CHUNK] for start in range(0, len(content), SCAN_CHUNK)
+        )
         
         # Extract title
         title = self._extract_title(content, file_path)
         
+        return self._score(file_path, content_hits, title)
+    
+    def _categorize_stream(self, file_path: Path, f: TextIO) -> DocumentAnalysis:
+        """Categorize an open file, holding at most about one chunk of it in memory
+        
+        The title is read from the leading lines up to the first heading; the
+        keyword scan then reads the file again in chunks and stops once every
+        keyword has been found.
+        """
+        title = self._first_title(f)
+        if title is None:
+            title = self._filename_title(file_path)
+        
+        f.seek(0)
+        content_hits = self._keyword_hits(iter(lambda: f.read(SCAN_CHUNK), ""))
+        return self._score(file_path, content_hits, title)
+    
+    @staticmethod
+    def _first_title(lines: Iterable[str]) -> Optional[str]:
+        """Title of the first heading TITLE_RE matches in the given lines, read only as far as that heading"""
+        lines = iter(lines)
+        line = next(lines, None)
+        while line is not None:
+            if not line.startswith('#'):
+                line = next(lines, None)
+                continue
+            text = line
+            line = None
+            if text[1:].isspace() or text == '#':
+                # TITLE_RE's '\s+' runs on across blank lines to the next line with text
+                for line in lines:
+                    text += line
+                    if not line.isspace():
+                        break
+                else:
+                    line = None
+            title_match = TITLE_RE.match(text)
+            if title_match:
+                return title_match.group(1).strip()
+            if line is None:
+                line = next(lines, None)
+            # otherwise the line the heading ran into may be a heading itself
+        return None
+    
+    def _score(self, file_path: Path, content_hits: Set[str], title: str) -> DocumentAnalysis:
+        """Pick the best category from the document's keyword hits and its filename"""
+        filename_lower = file_path.name.lower()
+        
         # Score each category
         scores = {}
         reasons = {}
         
-        for category, rules in self.rules["categories"].items():
+        for category, keywords, keyword_count, patterns, pattern_count, weight in self._compiled_rules:
             score = 0.0
             reason_parts = []
             
             # Content keyword matching
-            keyword_matches = sum(1 for keyword in rules["keywords"] if keyword in content_lower)
+            keyword_matches = sum(map(content_hits.__contains__, keywords))
             if keyword_matches > 0:
-                content_score = (keyword_matches / len(rules["keywords"])) * 0.7
+                content_score = (keyword_matches / keyword_count) * 0.7
                 score += content_score
                 reason_parts.append(f"{keyword_matches} content keywords")
             
             # Filename pattern matching
-            filename_matches = sum(1 for pattern in rules["filename_patterns"] if pattern in filename_lower)
+            filename_matches = sum(map(filename_lower.__contains__, patterns))
             if filename_matches > 0:
-                filename_score = (filename_matches / len(rules["filename_patterns"])) * 0.3
+                filename_score = (filename_matches / pattern_count) * 0.3
                 score += filename_score
                 reason_parts.append(f"{filename_matches} filename patterns")
             
             # Apply category weight
-            score *= rules.get("weight", 1.0)
+            score *= weight
             
             scores[category] = score
             reasons[category] = ", ".join(reason_parts) if reason_parts else "no matches"
@@ -140,14 +224,45 @@ class DocumentCategorizer:
             title=title
         )
     
+    def _keyword_hits(self, chunks: Iterable[str]) -> Set[str]:
+        """Return the keywords found, case-insensitively, in text given as consecutive chunks
+        
+        Each chunk is lowercased on its own, prefixed with the end of the previous
+        one so keywords straddling a boundary still match; no lowercased copy of
+        the whole document is made. Each distinct keyword is searched for until found.
+        """
+        missing = set(self._keywords)
+        hits = set()
+        overlap = max(map(len, missing), default=1) - 1
+        tail = ""
+        for chunk in chunks:
+            window = tail + chunk
+            window_lower = window.lower()
+            found = {keyword for keyword in missing if keyword in window_lower}
+            hits |= found
+            missing -= found
+            if not missing:
+                break
+            tail = window[-overlap:] if overlap else ""
+        return hits
+    
     def _extract_title(self, content: str, file_path: Path) -> str:
         """Extract title from content or filename"""
-        import re
+        # Most docs open with their title, which needs no scan of the body
+        first_line = content.partition('\n')[0]
+        if first_line.startswith('# '):
+            title = first_line[2:].strip()
+            if title:
+                return title
         
         # Try to find markdown title
-        title_match = re.search(r'^#\s+(.+?)$', content, re.MULTILINE)
+        title_match = TITLE_RE.search(content)
         if title_match:
             return title_match.group(1).strip()
         
         # Fall back to filename
+        return self._filename_title(file_path)
+    
+    def _filename_title(self, file_path: Path) -> str:
+        """Title derived from the filename"""
         return file_path.stem.replace('_', ' ').replace('-', ' ').title() 
\ No newline at end of file
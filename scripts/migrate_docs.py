@@ -5,19 +5,73 @@ Document migration and analysis module for the knowledge base CLI.
 
 import os
 import json
-import asyncio
 import hashlib
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
-from dataclasses import dataclass, asdict
+from typing import AsyncIterable, Dict, Iterable, List, Optional, Set, Tuple, Union
+from dataclasses import dataclass, replace
 from enum import Enum
 import re
 
+try:
+    import ahocorasick
+except ImportError:  # optional: without it each keyword is searched for separately
+    ahocorasick = None
+
 # Directory constants
 DOCS_DIR = Path("docs")
 KNOWLEDGE_BASE = DOCS_DIR / "knowledge"
 ARCHIVE_DIR = DOCS_DIR / "archive"
 
+TITLE_RE = re.compile(r'^#\s+(.+?)$', re.MULTILINE)
+# TITLE_RE for ASCII bytes; the class is what str \s matches in the ASCII range
+ASCII_TITLE_RE = re.compile(rb'^#[\t\n\x0b\x0c\r\x1c-\x1f ]+(.+?)$', re.MULTILINE)
+ASCII_LOWER = bytes.maketrans(bytes(range(0x41, 0x5B)), bytes(range(0x61, 0x7B)))
+
+# Content keywords per category, matched against the lowercased document
+TRAINING_KEYWORDS = ('neat', 'training', 'evolution', 'fitness', 'tournament', 'population', 'genome', 'generation', 'mutation', 'crossover', 'neural network', 'neuroevolution')
+AGENT_KEYWORDS = ('agent', 'sensor', 'perception', 'brain', 'ai behavior', 'decision', 'worldview', 'action')
+GAMEPLAY_KEYWORDS = ('gameplay', 'combat', 'battle', 'simulation', 'physics', 'match', 'health', 'damage', 'weapon', 'shield')
+DEVELOPMENT_KEYWORDS = ('setup', 'install', 'build', 'development', 'architecture', 'cargo', 'rust', 'wasm', 'implementation')
+GUIDE_KEYWORDS = ('tutorial', 'guide', 'how to', 'step by step', 'walkthrough', 'implementation guide')
+REFERENCE_KEYWORDS = ('api', 'reference', 'documentation', 'spec', 'interface', 'contract')
+
+CONTENT_KEYWORDS = frozenset(TRAINING_KEYWORDS + AGENT_KEYWORDS + GAMEPLAY_KEYWORDS +
+                             DEVELOPMENT_KEYWORDS + GUIDE_KEYWORDS + REFERENCE_KEYWORDS)
+
+def _build_keyword_automaton():
+    """Aho-Corasick automaton over CONTENT_KEYWORDS, or None without pyahocorasick"""
+    if ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    for keyword in CONTENT_KEYWORDS:
+        automaton.add_word(keyword, keyword)
+    automaton.make_automaton()
+    return automaton
+
+KEYWORD_AUTOMATON = _build_keyword_automaton()
+# (encoded, keyword) pairs for searching ASCII documents without decoding them
+KEYWORD_BYTES = tuple((keyword.encode(), keyword) for keyword in CONTENT_KEYWORDS)
+
+# Filename fragments that earn a category a +2 bonus
+TRAINING_FILENAME_KEYWORDS = ('neat', 'train', 'evolution', 'fitness')
+AGENT_FILENAME_KEYWORDS = ('agent', 'brain', 'sensor')
+GAMEPLAY_FILENAME_KEYWORDS = ('game', 'combat', 'battle', 'simulation')
+DEVELOPMENT_FILENAME_KEYWORDS = ('setup', 'dev', 'build', 'architecture')
+GUIDE_FILENAME_KEYWORDS = ('tutorial', 'guide', 'howto')
+REFERENCE_FILENAME_KEYWORDS = ('api', 'spec', 'ref')
+
+# (category, content keywords, filename keywords, tutorial/guide label) in
+# tie-break order; a guide whose best category has no label is filed as guides
+CATEGORY_RULES = (
+    ('training', TRAINING_KEYWORDS, TRAINING_FILENAME_KEYWORDS, "Training"),
+    ('agents', AGENT_KEYWORDS, AGENT_FILENAME_KEYWORDS, "Agent"),
+    ('gameplay', GAMEPLAY_KEYWORDS, GAMEPLAY_FILENAME_KEYWORDS, "Gameplay"),
+    ('development', DEVELOPMENT_KEYWORDS, DEVELOPMENT_FILENAME_KEYWORDS, "Development"),
+    ('guides', GUIDE_KEYWORDS, GUIDE_FILENAME_KEYWORDS, None),
+    ('reference', REFERENCE_KEYWORDS, REFERENCE_FILENAME_KEYWORDS, None),
+)
+GUIDES_INDEX = 4
+
 class DocumentCategory(Enum):
     """Document categories for organization"""
     AGENTS = "agents"
@@ -28,7 +82,7 @@ class DocumentCategory(Enum):
     REFERENCE = "reference"
     MISC = "misc"
 
-@dataclass
+@dataclass(frozen=True)
 class DocumentAnalysis:
     """Analysis result for a document"""
     file_path: Path
@@ -52,13 +106,21 @@ class DocumentAnalysis:
 def analyze_file(file_path: Path) -> DocumentAnalysis:
     """Analyze a single file and determine its category"""
     try:
-        content = file_path.read_text(encoding='utf-8', errors='ignore')
+        raw = file_path.read_bytes()
         
-        # Extract title
-        title = extract_title(content, file_path)
+        # Most docs are ASCII: search the bytes as read, lowercased in place of
+        # decoding. A lone \r would be a newline in text mode, so those files
+        # take the text path too
+        if raw.isascii() and raw.count(b'\r') == raw.count(b'\r\n'):
+            title = extract_ascii_title(raw, file_path)
+            content_lower = raw.translate(ASCII_LOWER)
+        else:
+            content = raw.decode('utf-8', errors='ignore').replace('\r\n', '\n').replace('\r', '\n')
+            title = extract_title(content, file_path)
+            content_lower = content.lower()
         
         # Categorize based on content
-        category, confidence, reason = categorize_content(content, file_path, title)
+        category, confidence, reason = score_content(content_lower, file_path)
         
         return DocumentAnalysis(
             file_path=file_path,
@@ -80,96 +142,197 @@ def analyze_file(file_path: Path) -> DocumentAnalysis:
 def extract_title(content: str, file_path: Path) -> str:
     """Extract title from content or filename"""
     # Try to find markdown title
-    title_match = re.search(r'^#\s+(.+?)$', content, re.MULTILINE)
+    title_match = TITLE_RE.search(content)
     if title_match:
         return title_match.group(1).strip()
     
     # Fall back to filename
     return file_path.stem.replace('_', ' ').replace('-', ' ').title()
 
+def extract_ascii_title(raw: bytes, file_path: Path) -> str:
+    """extract_title for ASCII content, decoding only the title"""
+    title_match = ASCII_TITLE_RE.search(raw)
+    if title_match:
+        return title_match.group(1).decode('ascii').strip()
+    return extract_title("", file_path)
+
+def keyword_hits(content_lower: Union[str, bytes]) -> Set[str]:
+    """Return the CONTENT_KEYWORDS that occur in the lowercased content
+    
+    With pyahocorasick installed this is one pass over the content that stops
+    once every keyword has been seen; otherwise each keyword is searched once.
+    ASCII content may be given as bytes. There is no stopping once one category
+    leads by a margin: the winning score sets the confidence and reason too.
+    """
+    if isinstance(content_lower, bytes):
+        if KEYWORD_AUTOMATON is None:
+            return {keyword for encoded, keyword in KEYWORD_BYTES if encoded in content_lower}
+        content_lower = content_lower.decode('ascii')
+    if KEYWORD_AUTOMATON is None:
+        return {keyword for keyword in CONTENT_KEYWORDS if keyword in content_lower}
+    hits = set()
+    remaining = len(CONTENT_KEYWORDS)
+    for _, keyword in KEYWORD_AUTOMATON.iter(content_lower):
+        if keyword not in hits:
+            hits.add(keyword)
+            remaining -= 1
+            if not remaining:
+                break
+    return hits
+
 def categorize_content(content: str, file_path: Path, title: str) -> Tuple[str, float, str]:
     """Categorize content based on keywords and patterns"""
-    content_lower = content.lower()
-    title_lower = title.lower()
+    return score_content(content.lower(), file_path)
+
+def score_content(content_lower: Union[str, bytes], file_path: Path) -> Tuple[str, float, str]:
+    """categorize_content for content that is already lowercased"""
     filename_lower = file_path.name.lower()
     
-    # Count keyword matches for better scoring
-    training_keywords = ['neat', 'training', 'evolution', 'fitness', 'tournament', 'population', 'genome', 'generation', 'mutation', 'crossover', 'neural network', 'neuroevolution']
-    agent_keywords = ['agent', 'sensor', 'perception', 'brain', 'ai behavior', 'decision', 'worldview', 'action']
-    gameplay_keywords = ['gameplay', 'combat', 'battle', 'simulation', 'physics', 'match', 'health', 'damage', 'weapon', 'shield']
-    development_keywords = ['setup', 'install', 'build', 'development', 'architecture', 'cargo', 'rust', 'wasm', 'implementation']
-    guide_keywords = ['tutorial', 'guide', 'how to', 'step by step', 'walkthrough', 'implementation guide']
-    reference_keywords = ['api', 'reference', 'documentation', 'spec', 'interface', 'contract']
-    
-    # Score each category
-    training_score = sum(1 for kw in training_keywords if kw in content_lower)
-    agent_score = sum(1 for kw in agent_keywords if kw in content_lower)
-    gameplay_score = sum(1 for kw in gameplay_keywords if kw in content_lower)
-    development_score = sum(1 for kw in development_keywords if kw in content_lower)
-    guide_score = sum(1 for kw in guide_keywords if kw in content_lower)
-    reference_score = sum(1 for kw in reference_keywords if kw in content_lower)
-    
-    # Add filename bonus
-    if any(kw in filename_lower for kw in ['neat', 'train', 'evolution', 'fitness']):
-        training_score += 2
-    if any(kw in filename_lower for kw in ['agent', 'brain', 'sensor']):
-        agent_score += 2
-    if any(kw in filename_lower for kw in ['game', 'combat', 'battle', 'simulation']):
-        gameplay_score += 2
-    if any(kw in filename_lower for kw in ['setup', 'dev', 'build', 'architecture']):
-        development_score += 2
-    if any(kw in filename_lower for kw in ['tutorial', 'guide', 'howto']):
-        guide_score += 2
-    if any(kw in filename_lower for kw in ['api', 'spec', 'ref']):
-        reference_score += 2
-    
-    # Find the best category
-    scores = {
-        'training': training_score,
-        'agents': agent_score,
-        'gameplay': gameplay_score,
-        'development': development_score,
-        'guides': guide_score,
-        'reference': reference_score
-    }
-    
-    best_category = max(scores, key=scores.get)
-    best_score = scores[best_category]
+    # Score each category by the distinct keywords found, plus a filename bonus
+    hits = keyword_hits(content_lower)
+    scores = [
+        sum(map(hits.__contains__, keywords)) + (2 if any(map(filename_lower.__contains__, filename_keywords)) else 0)
+        for _, keywords, filename_keywords, _ in CATEGORY_RULES
+    ]
     
+    # Find the best category; the first one wins ties
+    best_score = max(scores)
     if best_score == 0:
         return "misc", 0.3, "No clear category matches found"
+    best_category, _, _, guide_label = CATEGORY_RULES[scores.index(best_score)]
     
     # Calculate confidence based on score
     confidence = min(0.5 + (best_score * 0.1), 0.95)
     
     # Special handling for tutorials/guides
-    if guide_score > 0 and best_score > 1:
-        if best_category == 'training':
-            return "training", confidence, f"Training tutorial/guide (score: {best_score})"
-        elif best_category == 'agents':
-            return "agents", confidence, f"Agent tutorial/guide (score: {best_score})"
-        elif best_category == 'gameplay':
-            return "gameplay", confidence, f"Gameplay tutorial/guide (score: {best_score})"
-        elif best_category == 'development':
-            return "development", confidence, f"Development tutorial/guide (score: {best_score})"
-        else:
+    if scores[GUIDES_INDEX] > 0 and best_score > 1:
+        if guide_label is None:
             return "guides", confidence, f"General tutorial/guide (score: {best_score})"
+        return best_category, confidence, f"{guide_label} tutorial/guide (score: {best_score})"
     
     return best_category, confidence, f"Best match with score: {best_score}"
 
+class AnalysisCache:
+    """analyze_file results keyed by path, valid while the file's mtime and size match
+    
+    Persisted to .kb_cache/migrate_docs.json so process_files only re-analyzes
+    files that changed since an earlier run.
+    """
+    
+    def __init__(self, path: Path = Path(".kb_cache") / "migrate_docs.json"):
+        self.path = path
+        self.dirty = False
+        try:
+            self.entries: Dict[str, Dict] = json.loads(path.read_text())
+        except (OSError, ValueError):
+            self.entries = {}
+    
+    def lookup(self, file_path: Path, st: os.stat_result) -> Optional[DocumentAnalysis]:
+        entry = self.entries.get(str(file_path))
+        if entry is None or entry['mtime_ns'] != st.st_mtime_ns or entry['size'] != st.st_size:
+            return None
+        return DocumentAnalysis(file_path=file_path, **entry['analysis'])
+    
+    def store(self, analysis: DocumentAnalysis, st: os.stat_result):
+        if analysis.reason.startswith("Error"):
+            # Don't pin a transient failure to this file version
+            return
+        fields = analysis.to_dict()
+        del fields['file_path']
+        self.entries[str(analysis.file_path)] = {'mtime_ns': st.st_mtime_ns, 'size': st.st_size, 'analysis': fields}
+        self.dirty = True
+    
+    def discard(self, file_path: Path):
+        """Forget a file that has been moved away"""
+        if self.entries.pop(str(file_path), None) is not None:
+            self.dirty = True
+    
+    def save(self):
+        if not self.dirty:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.write_text(json.dumps(self.entries))
+            self.dirty = False
+        except OSError as e:
+            print(f"⚠️ Could not save analysis cache: {e}")
+
+def content_digest(file_path: Path, chunk_size: int = 1 << 20) -> bytes:
+    """BLAKE2b digest of a file's content, read in reusable chunks"""
+    h = hashlib.blake2b()
+    buf = bytearray(chunk_size)
+    view = memoryview(buf)
+    with open(file_path, 'rb', buffering=0) as f:
+        n = f.readinto(buf)
+        while n:
+            h.update(view[:n])
+            n = f.readinto(buf)
+    return h.digest()
+
 async def categorize_with_openrouter(file_path: Path) -> DocumentAnalysis:
     """Categorize using OpenRouter API (placeholder for now)"""
-    # For now, fall back to rule-based categorization
-    return analyze_file(file_path)
+    import asyncio
+    # For now, fall back to rule-based categorization, off the event loop so
+    # the reads of files queued in process_files overlap
+    return await asyncio.to_thread(analyze_file, file_path)
 
-async def process_files(file_paths: List[Path], dry_run: bool = False, interactive: bool = True) -> List[DocumentAnalysis]:
-    """Process multiple files for categorization"""
+async def process_files(file_paths: Union[Iterable[Path], AsyncIterable[Path]], dry_run: bool = False,
+                        interactive: bool = True, concurrency: int = 8) -> List[DocumentAnalysis]:
+    """Process multiple files for categorization
+    
+    Paths are consumed lazily and up to `concurrency` categorizations run
+    ahead of the one being reported, so producing paths and awaiting the API
+    overlap. Results are reported and applied in input order. Files unchanged
+    since an earlier run reuse that run's result from the AnalysisCache.
+    """
+    # Deferred so that importing this module (every kb invocation) skips asyncio
+    import asyncio
     results = []
+    pending: asyncio.Queue = asyncio.Queue(maxsize=concurrency)
+    # Categorizations by (file name, content digest): a duplicate reuses the
+    # first one's result. The name is part of the key because it is scored too
+    categorized: Dict[Tuple[str, bytes], asyncio.Task] = {}
+    cache = AnalysisCache()
+    
+    async def categorize(file_path: Path) -> DocumentAnalysis:
+        try:
+            st = file_path.stat()
+        except OSError:
+            return await categorize_with_openrouter(file_path)
+        analysis = cache.lookup(file_path, st)
+        if analysis is None:
+            analysis = await categorize_unique(file_path)
+            cache.store(analysis, st)
+        return analysis
+    
+    async def categorize_unique(file_path: Path) -> DocumentAnalysis:
+        try:
+            key = (file_path.name, await asyncio.to_thread(content_digest, file_path))
+        except OSError:
+            return await categorize_with_openrouter(file_path)
+        first = categorized.get(key)
+        if first is not None:
+            return replace(await first, file_path=file_path)
+        task = categorized[key] = asyncio.create_task(categorize_with_openrouter(file_path))
+        return await task
+    
+    async def produce():
+        try:
+            if isinstance(file_paths, AsyncIterable):
+                async for file_path in file_paths:
+                    await pending.put((file_path, asyncio.create_task(categorize(file_path))))
+            else:
+                for file_path in file_paths:
+                    await pending.put((file_path, asyncio.create_task(categorize(file_path))))
+        finally:
+            await pending.put(None)
     
-    for file_path in file_paths:
+    producer = asyncio.create_task(produce())
+    while (item := await pending.get()) is not None:
+        file_path, task = item
         print(f"📄 Analyzing: {file_path}")
         
-        analysis = analyze_file(file_path)
+        analysis = await task
         results.append(analysis)
         
         print(f"   Category: {analysis.category}")
@@ -194,10 +357,13 @@ async def process_files(file_paths: List[Path], dry_run: bool = False, interacti
             # Create directory and move file
             target_dir.mkdir(parents=True, exist_ok=True)
             file_path.rename(target_path)
+            cache.discard(file_path)
             print(f"   ✅ Moved to: {target_path}")
         
         print()
     
+    await producer
+    cache.save()
     return results
 
 def get_target_folder(category: str) -> str:
@@ -0,0 +1,31 @@
+import csv
+
+# Shared by the summarize scripts: the final tick of each generation in a health trends CSV
+
+def load_final_per_gen(csv_path):
+    """Return {gen: (tick, subject_health, opponent_health)} of each generation's final tick, ordered by gen"""
+    # analyze_replays writes each generation's frames as one tick-ordered run,
+    # so only the current run's latest row needs to be held while streaming
+    finals = []
+    last = None
+    with open(csv_path, newline='') as f:
+        reader = csv.reader(f)
+        next(reader)  # header
+        for gen_s, tick_s, subj_s, opp_s in reader:
+            gen = int(gen_s)
+            tick = int(tick_s)
+            if last is None or gen != last[0]:
+                if last is not None:
+                    finals.append(last)
+                last = (gen, tick, float(subj_s), float(opp_s))
+            elif tick > last[1]:
+                last = (gen, tick, float(subj_s), float(opp_s))
+    if last is not None:
+        finals.append(last)
+    # Generations come in replay-directory order, and one split across runs
+    # keeps its highest tick (the earliest row on a tie)
+    finals.sort(key=lambda row: (row[0], -row[1]))
+    trends = {}
+    for gen, tick, subj, opp in finals:
+        trends.setdefault(gen, (tick, subj, opp))
+    return trends
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+import os, csv, argparse
+
+from analyze_replays import health_rows, replay_paths
+from summarize_match_details import FIELDNAMES, match_details_row
+
+# This script does the work of analyze_replays, summarize_final_health and
+# summarize_match_details in one pass: each replay is parsed once and all
+# three CSVs are written as it goes, with no intermediate trends CSV re-read
+
+def main():
+    parser = argparse.ArgumentParser(description='Analyze NEAT replays and summarize final health and match details')
+    parser.add_argument('--replay-dir', default='out', help='Base output directory')
+    parser.add_argument('--analysis-dir', default='analysis', help='Directory to write CSVs')
+    args = parser.parse_args()
+
+    os.makedirs(args.analysis_dir, exist_ok=True)
+    trends_path = os.path.join(args.analysis_dir, 'health_trends.csv')
+    final_path = os.path.join(args.analysis_dir, 'final_health.csv')
+    details_path = os.path.join(args.analysis_dir, 'match_details.csv')
+    with open(trends_path, 'w', newline='') as trends_file, \
+         open(final_path, 'w', newline='') as final_file, \
+         open(details_path, 'w', newline='') as details_file:
+        trends = csv.writer(trends_file)
+        trends.writerow(['gen','tick','subject_health','opponent_health'])
+        final_health = csv.writer(final_file)
+        final_health.writerow(['gen','final_subject_health','final_opponent_health'])
+        match_details = csv.writer(details_file)
+        match_details.writerow(FIELDNAMES)
+        # Generations come in numeric order, so each summary row is written as its replay finishes
+        for gen, path in replay_paths(args.replay_dir):
+            final = None
+            for row in health_rows(gen, path):
+                trends.writerow(row)
+                # keep the highest tick (final) health
+                if final is None or row[1] > final[1]:
+                    final = row
+            if final is None:
+                continue
+            # Summaries hold floats, as they did when read back from the trends CSV
+            tick, subj, opp = final[1], float(final[2]), float(final[3])
+            final_health.writerow((gen, subj, opp))
+            match_details.writerow(match_details_row(gen, tick, subj, opp))
+    print(f"Wrote {trends_path}, {final_path} and {details_path}")
+
+if __name__ == '__main__':
+    main()
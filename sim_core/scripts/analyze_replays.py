@@ -1,8 +1,65 @@
 #!/usr/bin/env python3
-import os, glob, json, csv, argparse
+import os, csv, argparse
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    from orjson import loads
+except ImportError:
+    from json import loads
 
 # This script parses champion replay JSONL files and extracts health trends per tick/gen
 
+if msgspec is not None:
+    class Frame(msgspec.Struct):
+        """The parts of a replay frame used here; other fields are skipped while decoding"""
+        tick: int
+        agents: list
+
+    decode_frame = msgspec.json.Decoder(Frame).decode
+
+    def parse_frame(line):
+        """Return (tick, agents) of a replay frame"""
+        frame = decode_frame(line)
+        return frame.tick, frame.agents
+else:
+    # sim_core's run_match_record serializes Frame fields in declaration order
+    # (tick, agents, wrecks), so the wrecks array can be cut off unparsed
+    WRECKS_FIELD = b',"wrecks":'
+
+    def parse_frame(line):
+        """Return (tick, agents) of a replay frame"""
+        head, sep, _ = line.partition(WRECKS_FIELD)
+        frame = loads(head + b'}') if sep else loads(line)
+        if 'agents' not in frame:
+            frame = loads(line)
+        return frame['tick'], frame['agents']
+
+def health_rows(gen, path):
+    """Yield (gen, tick, subject_health, opponent_health) for each frame of a replay"""
+    with open(path, 'rb') as f:
+        for line in f:
+            tick, agents = parse_frame(line)
+            # health indices based on AGENT_STRIDE=6, IDX_HEALTH=3
+            yield (gen, tick, agents[3], agents[6 + 3] if len(agents) >= 9 else None)
+
+def replay_paths(replay_dir):
+    """Return (gen, path) of each gen_<n>/champ_replay.jsonl under replay_dir, in generation order"""
+    try:
+        entries = os.scandir(replay_dir)
+    except FileNotFoundError:
+        return []
+    with entries:
+        gens = [(int(entry.name[4:]), os.path.join(entry.path, 'champ_replay.jsonl'))
+                for entry in entries
+                if entry.name.startswith('gen_') and entry.name[4:].isdigit() and entry.is_dir()]
+    # Numeric sort, so gen_10 comes after gen_2
+    gens.sort()
+    return [(gen, path) for gen, path in gens if os.path.isfile(path)]
+
 def main():
     parser = argparse.ArgumentParser(description='Analyze NEAT replays')
     parser.add_argument('--replay-dir', default='out', help='Base output directory')
@@ -10,26 +67,13 @@ def main():
     args = parser.parse_args()
 
     os.makedirs(args.analysis_dir, exist_ok=True)
-    rows = []
-    pattern = os.path.join(args.replay_dir, 'gen_*/champ_replay.jsonl')
-    for path in sorted(glob.glob(pattern)):
-        gen = int(path.split('gen_')[1].split(os.sep)[0])
-        with open(path) as f:
-            for line in f:
-                frame = json.loads(line)
-                tick = frame['tick']
-                agents = frame['agents']
-                # health indices based on AGENT_STRIDE=6, IDX_HEALTH=3
-                subject_health = agents[3]
-                opponent_health = agents[6 + 3] if len(agents) >= 9 else None
-                rows.append({'gen': gen, 'tick': tick,
-                             'subject_health': subject_health,
-                             'opponent_health': opponent_health})
     csv_path = os.path.join(args.analysis_dir, 'health_trends.csv')
+    # Rows are written as each frame is parsed rather than collected first
     with open(csv_path, 'w', newline='') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=['gen','tick','subject_health','opponent_health'])
-        writer.writeheader()
-        writer.writerows(rows)
+        writer = csv.writer(csvfile)
+        writer.writerow(['gen','tick','subject_health','opponent_health'])
+        for gen, path in replay_paths(args.replay_dir):
+            writer.writerows(health_rows(gen, path))
     print(f"Wrote {csv_path}")
 
 if __name__ == '__main__':
@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+import argparse
+
+from _trend_utils import load_final_per_gen
+from summarize_final_health import write_final_health
+from summarize_match_details import write_match_details
+
+# Runs summarize_final_health and summarize_match_details off a single read of the trends CSV
+
+def main():
+    parser = argparse.ArgumentParser(description='Summarize final health and match details per generation')
+    parser.add_argument('--csv', default='analysis/health_trends.csv', help='Health trends CSV')
+    parser.add_argument('--final-out', default='analysis/final_health.csv', help='Output final health CSV')
+    parser.add_argument('--details-out', default='analysis/match_details.csv', help='Output match details CSV')
+    args = parser.parse_args()
+
+    trends = load_final_per_gen(args.csv)
+    write_final_health(trends, args.final_out)
+    write_match_details(trends, args.details_out)
+    print(f"Wrote {args.final_out} and {args.details_out}")
+
+if __name__ == '__main__':
+    main()
@@ -1,32 +1,26 @@
 #!/usr/bin/env python3
 import csv, os, argparse
 
+from _trend_utils import load_final_per_gen
+
+def write_final_health(trends, out):
+    """Write the final subject and opponent health per generation"""
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['gen','final_subject_health','final_opponent_health'])
+        for gen, (tick, subj, opp) in trends.items():
+            writer.writerow((gen, subj, opp))
+
 def main():
     parser = argparse.ArgumentParser(description='Summarize final champion/opponent health per generation')
     parser.add_argument('--csv', default='analysis/health_trends.csv', help='Health trends CSV')
     parser.add_argument('--out', default='analysis/final_health.csv', help='Output summary CSV')
     args = parser.parse_args()
-    # Read trends
-    summaries = {}
-    with open(args.csv) as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            gen = int(row['gen'])
-            tick = int(row['tick'])
-            subj = float(row['subject_health'])
-            opp = float(row['opponent_health'])
-            # keep the highest tick (final) health
-            if gen not in summaries or tick > summaries[gen]['tick']:
-                summaries[gen] = {'tick': tick, 'subj': subj, 'opp': opp}
+    # Read trends, keeping the highest tick (final) health
+    trends = load_final_per_gen(args.csv)
     # Write summary
-    os.makedirs(os.path.dirname(args.out), exist_ok=True)
-    with open(args.out, 'w', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow(['gen','final_subject_health','final_opponent_health'])
-        for gen in sorted(summaries):
-            writer.writerow([gen,
-                             summaries[gen]['subj'],
-                             summaries[gen]['opp']])
+    write_final_health(trends, args.out)
     print(f"Wrote {args.out}")
 
 if __name__ == '__main__':
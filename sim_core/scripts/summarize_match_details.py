@@ -1,47 +1,41 @@
 #!/usr/bin/env python3
 import os, csv, argparse
 
+from _trend_utils import load_final_per_gen
+
+FIELDNAMES = ['gen','final_tick','subject_health','opponent_health','winner','champ_label','opp_label']
+
+def match_details_row(gen, tick, subj, opp):
+    """Match details row, in FIELDNAMES order, for a generation's final tick"""
+    winner = 'draw'
+    if subj > opp:
+        winner = 'subject'
+    elif opp > subj:
+        winner = 'opponent'
+    champ_label = 'hof0'
+    opp_label = 'hof1'
+    return (gen, tick, subj, opp, winner, champ_label, opp_label)
+
+def write_match_details(trends, out):
+    """Write the match details of each generation's final tick"""
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(FIELDNAMES)
+        for gen, (tick, subj, opp) in trends.items():
+            writer.writerow(match_details_row(gen, tick, subj, opp))
+
 def main():
     parser = argparse.ArgumentParser(description='Summarize match details per generation')
     parser.add_argument('--health-csv', default='analysis/health_trends.csv', help='Health trends CSV')
     parser.add_argument('--out', default='analysis/match_details.csv', help='Output summary CSV')
     args = parser.parse_args()
 
-    # Read health trends
-    trends = {}
-    with open(args.health_csv) as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            gen = int(row['gen'])
-            tick = int(row['tick'])
-            subj = float(row['subject_health'])
-            opp = float(row['opponent_health'])
-            # track final state
-            if gen not in trends or tick > trends[gen]['tick']:
-                trends[gen] = {'tick': tick, 'subj': subj, 'opp': opp}
+    # Read health trends, tracking the final state
+    trends = load_final_per_gen(args.health_csv)
 
     # Write match details
-    os.makedirs(os.path.dirname(args.out), exist_ok=True)
-    with open(args.out, 'w', newline='') as f:
-        fieldnames = ['gen','final_tick','subject_health','opponent_health','winner','champ_label','opp_label']
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        for gen in sorted(trends):
-            data = trends[gen]
-            winner = 'draw'
-            if data['subj'] > data['opp']:
-                winner = 'subject'
-            elif data['opp'] > data['subj']:
-                winner = 'opponent'
-            champ_label = 'hof0'
-            opp_label = 'hof1'
-            writer.writerow({'gen': gen,
-                             'final_tick': data['tick'],
-                             'subject_health': data['subj'],
-                             'opponent_health': data['opp'],
-                             'winner': winner,
-                             'champ_label': champ_label,
-                             'opp_label': opp_label})
+    write_match_details(trends, args.out)
     print(f"Wrote {args.out}")
 
 if __name__ == '__main__':
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Tests for the streaming categorizer in scripts/categorize_docs.py.
+"""
+
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / "scripts"))
+
+from categorize_docs import SCAN_CHUNK, DocumentCategorizer
+
+class StreamTitleTest(unittest.TestCase):
+    """Titles found by categorize_file regardless of where the scan chunks fall"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.categorizer = DocumentCategorizer(str(Path(self.tmp.name) / "no_rules.json"))
+
+    def categorize(self, content: str):
+        path = Path(self.tmp.name) / "doc.md"
+        path.write_text(content, encoding="utf-8")
+        return self.categorizer.categorize_file(path)
+
+    def test_title_after_first_chunk(self):
+        body = "training notes without a heading\n" * (SCAN_CHUNK // 33 + 10)
+        self.assertGreater(len(body), SCAN_CHUNK)
+        doc = self.categorize(body + "# Late Title\nmore text\n")
+        self.assertEqual(doc.title, "Late Title")
+
+    def test_title_split_across_chunk_boundary(self):
+        heading = "# Split Across Chunks\n"
+        padding = "x" * 99 + "\n"
+        body = padding * (SCAN_CHUNK // len(padding))
+        # The chunk boundary falls in the middle of the heading line
+        body += "y" * (SCAN_CHUNK - len(body) - len(heading) // 2 - 1) + "\n"
+        self.assertLess(len(body), SCAN_CHUNK)
+        self.assertGreater(len(body) + len(heading), SCAN_CHUNK)
+        doc = self.categorize(body + heading + "agent sensor brain\n")
+        self.assertEqual(doc.title, "Split Across Chunks")
+
+    def test_heading_text_after_blank_lines_across_chunk_boundary(self):
+        # TITLE_RE's '\s+' runs from a bare '#' across blank lines
+        body = "z" * (SCAN_CHUNK - 3) + "\n#\n"
+        doc = self.categorize(body + "\n\n   Bare Hash Title\n")
+        self.assertEqual(doc.title, "Bare Hash Title")
+
+    def test_filename_title_without_heading(self):
+        doc = self.categorize("#tag only\nno headings here\n")
+        self.assertEqual(doc.title, "Doc")
+
+    def test_matches_whole_content_categorization(self):
+        content = "intro\n" * 20000 + "# Agents\nagent sensor brain perception\n"
+        path = Path(self.tmp.name) / "agent_notes.md"
+        path.write_text(content, encoding="utf-8")
+        self.assertEqual(self.categorizer.categorize_file(path),
+                         self.categorizer._categorize_content(path, content))
+
+if __name__ == "__main__":
+    unittest.main()